@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# Phase-level benchmark of Processor + scheduler model on synthetic rosters.
+# generate_roster() builds worksheet-shaped rows (doctor header, parameter rows, one row
+# per date with "must" / "must not" / "willing" / "reluctant" cells) from a seed, every
+# case is run through parsing, validation, model build, solve and export against an
+# in-memory spreadsheet, and the timings go to a JSON file that can be compared with
+# the file of another commit:
+#
+#   python3 Benchmark.py --doctors 10 20 --days 35 90 --output bench.json
+#   python3 Benchmark.py --doctors 10 20 --days 35 90 --compare bench.json
+#
+# --parity solves the same cases on every available backend (highspy, and AMPL when it
+# can be started) with a zero MIP gap, and checks the objectives against each other,
+# against ScheduleScorer and, on tiny rosters, against brute-force enumeration:
+#
+#   python3 Benchmark.py --parity --doctors 6 10 --days 14 35 --seeds 0 1 2 3 4
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import HeuristicSolver
+import Params
+import Processor
+import ScheduleScorer
+from HighsSchedulerModel import HighsSchedulerModel
+from LocalStorage import LocalSpreadsheet
+from SchedulerModel import SchedulerModel
+
+PHASES = ["parse", "validate", "heuristic", "build", "solve", "export"]
+
+BACKENDS = {"highs": lambda : HighsSchedulerModel(mip_gap=0), "ampl": lambda : SchedulerModel(mip_gap=0)}
+PARITY_TOLERANCE = 1e-6
+BRUTE_FORCE_LIMIT = 200000  # schedules enumerated at most
+
+
+def generate_roster(doctors=20, days=60, fixed_density=0.05, preference_density=0.25,
+                    dense_share=0.2, sparse_share=0.2, weekend_share=0.3, disabled_share=0.0,
+                    seed=0, start=date(2025, 1, 1)):
+    # fixed_density: share of doctor x day cells marked "must not" (plus about half as
+    # many days with a "must"); preference_density: share marked "willing" / "reluctant";
+    # *_share: share of doctors with prefer_dense, prefer_sparse, a weekend target, disabled
+    rnd = random.Random(seed)
+    names = [f"Doctor {i + 1}" for i in range(doctors)]
+    per_doctor = days / max(1, doctors)
+
+    def flags(share):
+        chosen = set(rnd.sample(range(doctors), round(share * doctors)))
+        return ["TRUE" if i in chosen else "" for i in range(doctors)]
+
+    dense = flags(dense_share)
+    # a doctor prefers dense or sparse, never both
+    sparse = ["" if dense[i] else flag for i, flag in enumerate(flags(sparse_share))]
+    weekend_target = flags(weekend_share)
+    disabled = flags(disabled_share)
+
+    min_shifts = [str(max(0, int(per_doctor * rnd.uniform(0.3, 0.7)))) for _ in names]
+    max_shifts = [str(min(-(-days // 3), int(per_doctor * rnd.uniform(1.3, 2.0)) + 1)) for _ in names]
+    rows = [
+        ["Date"] + names,
+        ["enabled"] + ["FALSE" if flag else "TRUE" for flag in disabled],
+        ["min_shifts"] + min_shifts,
+        ["preferred_shifts"] + [rnd.choice(["", str(round(per_doctor))]) for _ in names],
+        ["max_shifts"] + max_shifts,
+        ["preferred_shifts_weekday"] + ["" for _ in names],
+        ["preferred_shifts_weekend"] + [str(rnd.randint(1, 3)) if flag else "" for flag in weekend_target],
+        ["prefer_sparse"] + sparse,
+        ["prefer_dense"] + dense,
+        ["validation_result"] + ["" for _ in names],
+    ]
+
+    last_must = {}
+    for t in range(days):
+        row = [(start + timedelta(days=t)).isoformat()]
+        for i in range(doctors):
+            r = rnd.random()
+            if r < fixed_density:
+                row.append("must not")
+            elif r < fixed_density + preference_density / 2:
+                row.append("willing")
+            elif r < fixed_density + preference_density:
+                row.append("reluctant")
+            else:
+                row.append("")
+        if rnd.random() < fixed_density * doctors / 2:
+            # one "must" per day at most, respecting the 3-day rest window
+            candidates = [i for i in range(doctors) if not disabled[i]
+                          and row[i + 1] != "must not" and t - last_must.get(i, -3) >= 3]
+            if candidates:
+                i = rnd.choice(candidates)
+                row[i + 1] = "must"
+                last_must[i] = t
+        rows.append(row)
+    return rows
+
+
+def run_case(rows, backend="highs", linearized=False, symmetry_breaking=False, time_limit=None,
+             mip_gap=None, heuristic_seconds=None, log=lambda line : None):
+    # one pass over every phase; returns seconds per phase and the solve outcome.
+    # heuristic_seconds: also run HeuristicSolver with this budget and report its gap to the MIP
+    spreadsheet = LocalSpreadsheet("Benchmark", {"Roster": rows})
+    processor = Processor.Processor()
+    processor.set_logging( log )
+    processor.backend = backend
+    processor.linearized = linearized
+    processor.symmetry_breaking = symmetry_breaking
+    processor.warm_start = False
+    processor.time_limit = time_limit
+    processor.mip_gap = mip_gap
+    seconds = {}
+
+    def timed(phase, function):
+        start = time.perf_counter()
+        function()
+        seconds[phase] = seconds.get(phase, 0.0) + time.perf_counter() - start
+
+    result = {"seconds": seconds, "status": "ok", "error": None}
+    try:
+        processor.begin_writes( spreadsheet )
+        timed("parse", lambda : processor.load_worksheet( spreadsheet, spreadsheet.worksheet("Roster") ))
+        timed("validate", lambda : (processor.validate_input(), processor.ensure_feasible(),
+                                    processor.remove_disabled_doctors()))
+        if heuristic_seconds is not None:
+            heuristic = {}
+            timed("heuristic", lambda : heuristic.update(
+                HeuristicSolver.solve(processor.instance, time_limit=heuristic_seconds)))
+        timed("solve", processor.solve_model)
+        # model build is part of solve_model, split it out when it was measured
+        if processor.build_seconds is not None:
+            seconds["build"] = processor.build_seconds
+            seconds["solve"] -= processor.build_seconds
+        timed("export", lambda : (processor.export_schedule_to_full_sheet(),
+                                  processor.export_schedule_to_short_sheet(),
+                                  processor.commit_writes()))
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result.update({
+        "total_cost": float(processor.total_cost),
+        "optimal": processor.optimal,
+        "gap": processor.gap,
+        "pushed_values": processor.pushed_values,
+        "void_days": sum(doctor == "Void" for doctor in processor.assignment),
+    })
+    if heuristic_seconds is not None:
+        cost = result["total_cost"]
+        result["heuristic_cost"] = heuristic["objective"] if not heuristic["violations"] else None
+        result["heuristic_gap"] = None if result["heuristic_cost"] is None else \
+            round((result["heuristic_cost"] - cost) / abs(cost) * 100 if cost else 0.0, 3)
+    return result
+
+
+def parity_instance(rows):
+    # parsed, validated instance as Processor hands it to the model
+    processor = Processor.Processor()
+    processor.set_logging( lambda line : None )
+    processor.load_data( rows )
+    processor.ensure_feasible()
+    processor.remove_disabled_doctors()
+    return processor.instance
+
+
+def brute_force(instance):
+    # cheapest feasible schedule over every day -> doctor choice, or None when too many
+    D, T = len(instance.doctors), instance.num_days
+    if D ** T > BRUTE_FORCE_LIMIT:
+        return None
+    scorer = ScheduleScorer.ScheduleScorer(instance)
+    choices = np.array(list(itertools.product(range(D), repeat=T)), dtype=np.intp).reshape(-1, T)
+    X = np.zeros((len(choices), D, T), dtype=np.int8)
+    X[np.arange(len(choices))[:, None], choices, np.arange(T)] = 1
+    totals, violations = scorer.score_batch(X)
+    feasible = violations == 0
+    return float(totals[feasible].min()) if feasible.any() else None
+
+
+def solve_backend(name, instance):
+    # cold start (model creation), data push and solve of one backend, twice on the same model
+    result = {"status": "ok", "error": None}
+    try:
+        start = time.perf_counter()
+        model = BACKENDS[name]()
+        result["create_seconds"] = time.perf_counter() - start
+        for run in ("first", "second"):
+            start = time.perf_counter()
+            model.set_data(instance)
+            result[f"{run}_build_seconds"] = time.perf_counter() - start
+            start = time.perf_counter()
+            model.solve()
+            result[f"{run}_solve_seconds"] = time.perf_counter() - start
+        status = model.get_solve_result()
+        assignment = model.get_assignments(instance.doctors, instance.days)[0] if status == "solved" else None
+        if assignment is None or None in assignment:
+            raise Exception(f"solve_result: {status}")
+        result["objective"] = float(model.get_total_cost())
+        result["assignment"] = assignment
+        if hasattr(model, "close"):
+            model.close()
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    return result
+
+
+def parity_case(rows, backends=("highs", "ampl"), heuristic_seconds=0.2):
+    # objectives of every backend, re-scored by ScheduleScorer, the heuristic and brute force
+    instance = parity_instance(rows)
+    scorer = ScheduleScorer.ScheduleScorer(instance)
+    entry = {"backends": {}, "mismatches": []}
+    reference = None
+    for name in backends:
+        result = solve_backend(name, instance)
+        entry["backends"][name] = result
+        if result["status"] != "ok":
+            continue
+        score = scorer.score(ScheduleScorer.assignment_matrix(instance, result.pop("assignment")))
+        result["scored"] = score["total_cost"]
+        if score["violations"]:
+            entry["mismatches"].append(f"{name}: schedule breaks {score['violations'][0]}")
+        if abs(score["total_cost"] - result["objective"]) > PARITY_TOLERANCE * max(1.0, abs(result["objective"])):
+            entry["mismatches"].append(f"{name}: objective {result['objective']} != scored {score['total_cost']}")
+        if reference is None:
+            reference = result["objective"]
+        elif abs(result["objective"] - reference) > PARITY_TOLERANCE * max(1.0, abs(reference)):
+            entry["mismatches"].append(f"{name}: objective {result['objective']} != {backends[0]} {reference}")
+
+    heuristic = HeuristicSolver.solve(instance, time_limit=heuristic_seconds)
+    entry["heuristic"] = heuristic["objective"]
+    if not heuristic["violations"]:
+        scored = scorer.score(heuristic["matrix"])["total_cost"]
+        if abs(scored - heuristic["objective"]) > PARITY_TOLERANCE * max(1.0, abs(scored)):
+            entry["mismatches"].append(f"heuristic: objective {heuristic['objective']} != scored {scored}")
+        if reference is not None and heuristic["objective"] < reference - PARITY_TOLERANCE * max(1.0, abs(reference)):
+            entry["mismatches"].append(f"heuristic {heuristic['objective']} beats the optimum {reference}")
+
+    entry["brute_force"] = brute_force(instance)
+    if entry["brute_force"] is not None and reference is not None and \
+            abs(entry["brute_force"] - reference) > PARITY_TOLERANCE * max(1.0, abs(reference)):
+        entry["mismatches"].append(f"brute force {entry['brute_force']} != optimum {reference}")
+    return entry
+
+
+def available_backends(backends, log=print):
+    # backends whose model can be created here (AMPL needs its binaries and a licence)
+    available = []
+    for name in backends:
+        try:
+            model = BACKENDS[name]()
+            if hasattr(model, "close"):
+                model.close()
+            available.append(name)
+        except Exception as e:
+            log(f"{name}: not available ({type(e).__name__}), compared with ScheduleScorer / brute force only")
+    return available
+
+
+def run_parity(cases, backends=("highs", "ampl"), log=print):
+    # cases: dicts of generate_roster() arguments
+    backends = available_backends(backends, log=log)
+    results = []
+    for case in cases:
+        name = case_name(case["doctors"], case["days"], case["seed"])
+        try:
+            entry = dict(parity_case(generate_roster(**case), backends), name=name, case=case)
+        except Exception as e:
+            # e.g. a generated roster the feasibility pre-check rejects
+            log(f"{name:>16}  skipped: {e}")
+            continue
+        results.append(entry)
+        timings = []
+        for backend, result in entry["backends"].items():
+            if result["status"] != "ok":
+                timings.append(f"{backend}: {result['error'].splitlines()[0][:60]}")
+                continue
+            timings.append("{}: create={:.1f}ms build={:.1f}/{:.1f}ms solve={:.1f}/{:.1f}ms cost={}".format(
+                backend, result["create_seconds"] * 1000, result["first_build_seconds"] * 1000,
+                result["second_build_seconds"] * 1000, result["first_solve_seconds"] * 1000,
+                result["second_solve_seconds"] * 1000, result["objective"]))
+        extra = f"  brute force={entry['brute_force']}" if entry["brute_force"] is not None else ""
+        log(f"{name:>16}  " + "  ".join(timings) + f"  heuristic={entry['heuristic']:.2f}" + extra
+            + ("  ⚠️ " + "; ".join(entry["mismatches"]) if entry["mismatches"] else "  ✅"))
+    solved = {backend: [e["backends"][backend] for e in results if e["backends"][backend]["status"] == "ok"]
+              for backend in backends}
+    for backend, runs in solved.items():
+        if runs:
+            log("{}: {} case(s), median create {:.1f}ms, first build+solve {:.1f}ms, second {:.1f}ms".format(
+                backend, len(runs), statistics.median(r["create_seconds"] for r in runs) * 1000,
+                statistics.median(r["first_build_seconds"] + r["first_solve_seconds"] for r in runs) * 1000,
+                statistics.median(r["second_build_seconds"] + r["second_solve_seconds"] for r in runs) * 1000))
+    return results
+
+
+def case_name(doctors, days, seed):
+    return f"{doctors}x{days}-s{seed}"
+
+
+def run_benchmark(cases, settings, repeat=1, log=print):
+    # cases: dicts of generate_roster() arguments; settings: run_case() keyword arguments
+    results = []
+    for case in cases:
+        name = case_name(case["doctors"], case["days"], case["seed"])
+        rows = generate_roster(**case)
+        runs = [run_case(rows, **settings) for _ in range(repeat)]
+        failed = [run for run in runs if run["status"] != "ok"]
+        entry = {"name": name, "case": case, "runs": runs}
+        if failed:
+            entry.update(status="failed", error=failed[0]["error"])
+            log(f"{name:>16}  failed: {entry['error']}")
+        else:
+            # median over the repeats, phases that were not measured are left out
+            entry["status"] = "ok"
+            entry["median"] = {phase: statistics.median(run["seconds"][phase] for run in runs)
+                               for phase in PHASES if phase in runs[0]["seconds"]}
+            entry["median"]["total"] = statistics.median(sum(run["seconds"].values()) for run in runs)
+            for key in ("total_cost", "optimal", "gap", "pushed_values", "void_days", "heuristic_cost", "heuristic_gap"):
+                if key in runs[-1]:
+                    entry[key] = runs[-1][key]
+            log(f"{name:>16}  " + "  ".join(f"{phase}={entry['median'][phase] * 1000:8.1f}ms"
+                                           for phase in PHASES + ["total"] if phase in entry["median"])
+                + f"  cost={entry['total_cost']}"
+                + (f"  heuristic={entry['heuristic_cost']} ({entry['heuristic_gap']:+.2f}%)"
+                   if entry.get("heuristic_gap") is not None else ""))
+        results.append(entry)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        commit = None
+    try:
+        import highspy
+        highs = highspy.Highs().version()
+    except Exception:
+        highs = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "highs": highs,
+        "machine": platform.machine(),
+        "params": {name: getattr(Params, name) for name in dir(Params) if name.isupper()},
+    }
+
+
+def compare(old, new, threshold=1.25, log=print):
+    # per-phase median ratios new / old; returns the phases slower than threshold
+    regressions = []
+    old_results = {entry["name"]: entry for entry in old["results"] if entry["status"] == "ok"}
+    log(f"Comparing {old['environment'].get('commit')} -> {new['environment'].get('commit')}")
+    for entry in new["results"]:
+        before = old_results.get(entry["name"])
+        if before is None or entry["status"] != "ok":
+            continue
+        ratios = []
+        for phase in PHASES + ["total"]:
+            if phase in entry["median"] and before["median"].get(phase):
+                ratio = entry["median"][phase] / before["median"][phase]
+                ratios.append(f"{phase}={ratio:.2f}x")
+                # very short phases are mostly noise
+                if ratio > threshold and entry["median"][phase] > 0.05:
+                    regressions.append((entry["name"], phase, ratio))
+        cost = "" if before["total_cost"] == entry["total_cost"] else \
+            f"  cost {before['total_cost']} -> {entry['total_cost']}"
+        log(f"{entry['name']:>16}  " + "  ".join(ratios) + cost)
+    for name, phase, ratio in regressions:
+        log(f"⚠️ {name}: {phase} {ratio:.2f}x slower")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doctors", type=int, nargs="+", default=[10, 20])
+    parser.add_argument("--days", type=int, nargs="+", default=[35, 90])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--fixed-density", type=float, default=0.05)
+    parser.add_argument("--preference-density", type=float, default=0.25)
+    parser.add_argument("--dense-share", type=float, default=0.2)
+    parser.add_argument("--sparse-share", type=float, default=0.2)
+    parser.add_argument("--weekend-share", type=float, default=0.3)
+    parser.add_argument("--disabled-share", type=float, default=0.0)
+    parser.add_argument("--backend", default="highs", help='"highs" (no AMPL needed) or "ampl"')
+    parser.add_argument("--linearized", action="store_true")
+    parser.add_argument("--symmetry", action="store_true", help="symmetry breaking")
+    parser.add_argument("--time-limit", type=float, default=None)
+    parser.add_argument("--mip-gap", type=float, default=None)
+    parser.add_argument("--heuristic", type=float, default=None, metavar="SECONDS",
+                        help="also run the heuristic with this budget and report its gap to the MIP")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as regression")
+    parser.add_argument("--parity", action="store_true",
+                        help="check objective parity of the backends (and latency) instead of timing phases")
+    parser.add_argument("--tiny", type=int, default=10, help="with --parity: extra 3 x 6 rosters checked by brute force")
+    args = parser.parse_args()
+
+    cases = [{"doctors": doctors, "days": days, "seed": seed,
+              "fixed_density": args.fixed_density, "preference_density": args.preference_density,
+              "dense_share": args.dense_share, "sparse_share": args.sparse_share,
+              "weekend_share": args.weekend_share, "disabled_share": args.disabled_share}
+             for doctors in args.doctors for days in args.days for seed in args.seeds]
+    if args.parity:
+        tiny = [{"doctors": 3, "days": 6, "seed": seed, "weekend_share": args.weekend_share,
+                 "dense_share": 0.4, "sparse_share": 0.4} for seed in range(args.tiny)]
+        results = run_parity(tiny + cases)
+        mismatches = [entry for entry in results if entry["mismatches"]]
+        print(f"Parity: {len(results) - len(mismatches)} of {len(results)} case(s) agree")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"environment": environment(), "parity": results}, f, indent=1, default=str)
+        raise SystemExit(1 if mismatches else 0)
+    settings = {"backend": args.backend, "linearized": args.linearized, "symmetry_breaking": args.symmetry,
+                "time_limit": args.time_limit, "mip_gap": args.mip_gap, "heuristic_seconds": args.heuristic}
+    report = {"environment": environment(), "settings": settings, "repeat": args.repeat,
+              "results": run_benchmark(cases, settings, repeat=args.repeat)}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1, default=str)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, threshold=args.threshold)
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# Combinatorial pre-check run before the MIP. It can only prove infeasibility:
+# an empty result means no conflict was found, not that a schedule exists.
+from collections import deque
+import numpy as np
+from ProblemInstance import MUST, MUST_NOT
+
+REST_DAYS = 3  # Min_Rest_Period: at most one shift in any 3 consecutive days
+
+
+class FeasibilityResult :
+
+    def __init__(self):
+        self.reasons = {}  # doctor -> [message]
+
+    def add(self, doctor, message):
+        messages = self.reasons.setdefault(doctor, [])
+        if message not in messages:
+            messages.append(message)
+
+    @property
+    def infeasible(self):
+        return any(m.startswith("🚫") for messages in self.reasons.values() for m in messages)
+
+    def summary(self):
+        return [f"{doctor}: {m}" for doctor, messages in self.reasons.items() for m in messages]
+
+
+def max_spaced_shifts(available, forced, num_days):
+    # most shifts a single doctor can take on available days (forced days included)
+    # with REST_DAYS spacing; earliest-first greedy is optimal on a line
+    forced = set(forced)
+    next_forced = {}
+    following = None
+    for day in range(num_days - 1, -1, -1):
+        next_forced[day] = following
+        if day in forced:
+            following = day
+
+    count = 0
+    last = -REST_DAYS
+    for day in range(num_days):
+        if day in forced:
+            count += 1
+            last = day
+        elif day in available and day - last >= REST_DAYS:
+            upcoming = next_forced[day]
+            if upcoming is None or upcoming - day >= REST_DAYS:
+                count += 1
+                last = day
+    return count
+
+
+def max_flow_assignment(demand, candidates):
+    # bipartite b-matching: doctor d needs demand[d] distinct days out of candidates[d]
+    # returns (day -> doctor, doctor -> assigned count)
+    owner = {}
+    assigned = {d: 0 for d in demand}
+
+    # cheap greedy start, scarce days first
+    popularity = {}
+    for d, days in candidates.items():
+        for day in days:
+            popularity[day] = popularity.get(day, 0) + 1
+    for d in sorted(demand, key=lambda d: len(candidates[d])):
+        for day in sorted(candidates[d], key=lambda day: popularity[day]):
+            if assigned[d] >= demand[d]:
+                break
+            if day not in owner:
+                owner[day] = d
+                assigned[d] += 1
+
+    # augmenting paths doctor -> day -> owning doctor -> ... -> free day
+    for d in demand:
+        while assigned[d] < demand[d]:
+            parent = {d: None}
+            queue = deque([d])
+            free_day = None
+            while queue and free_day is None:
+                current = queue.popleft()
+                for day in candidates[current]:
+                    holder = owner.get(day)
+                    if holder is None:
+                        free_day = (day, current)
+                        break
+                    if holder not in parent:
+                        parent[holder] = (day, current)
+                        queue.append(holder)
+            if free_day is None:
+                break
+            day, current = free_day
+            owner[day] = current
+            while parent[current] is not None:
+                day, previous = parent[current]
+                owner[day] = previous
+                current = previous
+            assigned[d] += 1
+    return owner, assigned
+
+
+def reachable_doctors(start, candidates, owner):
+    # doctors reachable from an unsatisfied doctor in the residual graph = Hall-violating set
+    seen = {start}
+    days = set()
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        for day in candidates[current]:
+            days.add(day)
+            holder = owner.get(day)
+            if holder is not None and holder not in seen:
+                seen.add(holder)
+                queue.append(holder)
+    return seen, days
+
+
+def check_feasibility(instance):
+    # instance: ProblemInstance, disabled doctors still included
+    result = FeasibilityResult()
+    num_days, date_labels = instance.num_days, instance.date_labels
+    rows = np.flatnonzero(instance.regular & instance.enabled)
+    active = [instance.doctors[i] for i in rows]
+    min_shifts = dict(zip(active, instance.min_shifts[rows].tolist()))
+    max_shifts = dict(zip(active, instance.max_shifts[rows].tolist()))
+
+    musts = {d: np.flatnonzero(instance.fixed[i] == MUST).tolist() for d, i in zip(active, rows)}
+    blocked = {d: set(np.flatnonzero(instance.fixed[i] == MUST_NOT).tolist()) for d, i in zip(active, rows)}
+
+    # 1. two doctors forced onto the same day
+    must_by_day = {}
+    for d in active:
+        for day in musts[d]:
+            must_by_day.setdefault(day, []).append(d)
+    for day, forced in sorted(must_by_day.items()):
+        if len(forced) > 1:
+            for d in forced:
+                others = ", ".join(o for o in forced if o != d)
+                result.add(d, f"🚫 'must' on {date_labels[day]} also set for {others}")
+
+    # 2. 'must' days closer than the rest period, 3. more 'must' days than max_shifts
+    for d in active:
+        for a, b in zip(musts[d], musts[d][1:]):
+            if b - a < REST_DAYS:
+                result.add(d, f"🚫 'must' on {date_labels[a]} and {date_labels[b]} break the {REST_DAYS}-day rest period")
+        if len(musts[d]) > max_shifts.get(d, 0):
+            result.add(d, f"🚫 {len(musts[d])} 'must' days but max_shifts={max_shifts.get(d, 0)}")
+
+    # 4. per-doctor bound: free days (not 'must not', not another doctor's 'must') with rest spacing
+    candidates = {}
+    for d in active:
+        taken_by_others = {day for day, forced in must_by_day.items() if d not in forced}
+        available = set(range(num_days)) - blocked[d] - taken_by_others
+        candidates[d] = sorted(available)
+        required = min_shifts.get(d, 0)
+        if required <= 0:
+            continue
+        possible = min(max_spaced_shifts(available, set(musts[d]) - taken_by_others, num_days),
+                       max_shifts.get(d, 0))
+        if possible < required:
+            result.add(d, f"🚫 at most {possible} shifts possible for min_shifts={required}")
+
+    # 5. all minimums together against the days available to each doctor (matching bound)
+    demand = {d: min_shifts.get(d, 0) for d in active if min_shifts.get(d, 0) > 0}
+    if demand:
+        owner, assigned = max_flow_assignment(demand, {d: candidates[d] for d in demand})
+        # groups found from different unsatisfied doctors often share their days: merge
+        # them (the union still needs more shifts than those days) and report each once
+        groups = {}  # days -> doctors
+        reported = set()
+        for d in demand:
+            if assigned[d] >= demand[d] or d in reported:
+                continue
+            group, days = reachable_doctors(d, candidates, owner)
+            groups.setdefault(frozenset(days), set()).update(g for g in group if g in demand)
+            reported.update(group)
+        for days, group in groups.items():
+            group = sorted(group)
+            needed = sum(demand[g] for g in group)
+            for g in group:
+                others = [o for o in group if o != g]
+                if len(others) > 5:
+                    shared = f" together with {len(others)} other doctors"
+                else:
+                    shared = f" together with {', '.join(others)}" if others else ""
+                result.add(g, f"🚫 min_shifts{shared} need {needed} shifts but only {len(days)} days are available")
+    return result
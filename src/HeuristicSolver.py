@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# Schedules without a MIP solver: a greedy constructor (musts, then minimum shift counts,
+# then the cheapest doctor for every open day) followed by move / swap local search with
+# random restarts from the best schedule until the time budget (construction included) is
+# used up. Works on the ProblemInstance arrays and scores with the same Total_Cost terms
+# as SchedulerModel, so the result can be shown as a preview, passed as a MIP start or
+# exported when no solver is available.
+import time
+import numpy as np
+import Params
+from ProblemInstance import MUST, MUST_NOT
+
+REST_DAYS = 3  # at most one shift in any 3 consecutive days
+WINDOW = 5  # dense / sparse windows: 5 days holding 2+ shifts
+CHECK_EVERY = 8  # days scanned between two looks at the clock
+
+
+class HeuristicSolver :
+
+    def __init__(self, instance, seed=0):
+        self.instance = instance
+        self.rng = np.random.default_rng(seed)
+        D, T = len(instance.doctors), instance.num_days
+        self.D, self.T = D, T
+        self.void = instance.doctor_index.get("Void")
+        self.regular = instance.regular
+        self.day_cost = instance.day_cost
+        self.weekend = instance.weekend
+        self.must = instance.fixed == MUST
+        self.allowed = instance.fixed != MUST_NOT
+        self.locked = self.must.any(axis=0)  # days whose doctor is fixed
+        self.frequency = Params.PENALTY_WRONG_FREQUENCY * (
+            instance.prefer_sparse.astype(float) - instance.prefer_dense.astype(float))
+        # missing minimum shifts are allowed while searching, at a prohibitive cost
+        self.shortfall_penalty = 100 * (Params.COST_VOID + Params.BASE_COST)
+
+        self.x = np.zeros((D, T), dtype=bool)
+        self.owner = np.full(T, -1)
+        self.costs = np.zeros(D)
+        self.iterations = 0
+        self.moves = 0
+
+    # --- scoring -------------------------------------------------------------
+
+    def doctor_cost(self, i, row):
+        # Total_Cost terms of doctor i for the 0/1 day row, plus the shortfall penalty
+        inst = self.instance
+        total = int(row.sum())
+        weekend = int(row[self.weekend].sum())
+        cost = float(self.day_cost[i][row].sum())
+        if inst.preferred_shifts[i] >= 0:
+            cost += Params.PENALTY_NOT_PREFERRED_SHIFTS * abs(total - inst.preferred_shifts[i])
+        if inst.preferred_shifts_weekday[i] >= 0:
+            cost += Params.PENALTY_NOT_PREFERRED_SHIFTS * abs(total - weekend - inst.preferred_shifts_weekday[i])
+        wanted = inst.preferred_shifts_weekend[i]
+        if wanted >= 0:
+            cost += Params.PENALTY_MISSING_WEEKEND_SHIFT * max(0, wanted - weekend)
+            cost += Params.PENALTY_EXCESS_WEEKEND_SHIFT * max(0, weekend - wanted)
+        if self.frequency[i] and self.T >= WINDOW:
+            windows = np.convolve(row, np.ones(WINDOW, dtype=int), "valid") >= 2
+            cost += self.frequency[i] * int(windows.sum())
+        if self.regular[i] and total < inst.min_shifts[i]:
+            cost += self.shortfall_penalty * (inst.min_shifts[i] - total)
+        return cost
+
+    def objective(self):
+        # Total_Cost of the current schedule (without the shortfall penalty)
+        inst = self.instance
+        shortfall = np.maximum(0, inst.min_shifts - self.x.sum(axis=1))[self.regular].sum()
+        return float(self.costs.sum() - self.shortfall_penalty * shortfall)
+
+    def violations(self):
+        inst = self.instance
+        found = []
+        counts = self.x.sum(axis=1)
+        for i, doctor in enumerate(inst.doctors):
+            if not self.regular[i]:
+                continue
+            if counts[i] < inst.min_shifts[i]:
+                found.append(f"{doctor}: {counts[i]} shift(s), minimum {inst.min_shifts[i]}")
+            if counts[i] > inst.max_shifts[i]:
+                found.append(f"{doctor}: {counts[i]} shift(s), maximum {inst.max_shifts[i]}")
+        for t in np.flatnonzero((self.must & ~self.x).any(axis=0)):
+            found.append(f"day {inst.date_labels[t]}: a \"must\" shift is not assigned")
+        return found
+
+    # --- moves ---------------------------------------------------------------
+
+    def can_take(self, i, t, leaving=None):
+        # doctor i may get day t (while giving up day `leaving`, for swaps)
+        if not self.allowed[i, t]:
+            return False
+        if not self.regular[i]:
+            return True
+        if leaving is None and self.x[i].sum() >= self.instance.max_shifts[i]:
+            return False
+        near = self.x[i, max(0, t - REST_DAYS + 1):t + REST_DAYS]
+        if leaving is not None and abs(leaving - t) < REST_DAYS:
+            return int(near.sum()) == 1  # only the day being given up
+        return not near.any()
+
+    def set_day(self, t, i):
+        a = self.owner[t]
+        if a >= 0:
+            self.x[a, t] = False
+        self.x[i, t] = True
+        self.owner[t] = i
+
+    def move_delta(self, t, b):
+        # cost change of handing day t from its doctor to b
+        a = self.owner[t]
+        row_a, row_b = self.x[a].copy(), self.x[b].copy()
+        row_a[t], row_b[t] = False, True
+        new_a, new_b = self.doctor_cost(a, row_a), self.doctor_cost(b, row_b)
+        return new_a + new_b - self.costs[a] - self.costs[b], new_a, new_b
+
+    def apply_move(self, t, b, new_a, new_b):
+        a = self.owner[t]
+        self.set_day(t, b)
+        self.costs[a], self.costs[b] = new_a, new_b
+        self.moves += 1
+
+    def swap_delta(self, t1, t2):
+        # cost change of exchanging the doctors of days t1 and t2
+        a, b = self.owner[t1], self.owner[t2]
+        row_a, row_b = self.x[a].copy(), self.x[b].copy()
+        row_a[t1], row_a[t2] = False, True
+        row_b[t2], row_b[t1] = False, True
+        new_a, new_b = self.doctor_cost(a, row_a), self.doctor_cost(b, row_b)
+        return new_a + new_b - self.costs[a] - self.costs[b], new_a, new_b
+
+    def apply_swap(self, t1, t2, new_a, new_b):
+        a, b = self.owner[t1], self.owner[t2]
+        self.set_day(t1, b)
+        self.set_day(t2, a)
+        self.costs[a], self.costs[b] = new_a, new_b
+        self.moves += 1
+
+    def can_swap(self, t1, t2):
+        a, b = self.owner[t1], self.owner[t2]
+        if a == b or self.locked[t1] or self.locked[t2]:
+            return False
+        return self.can_take(a, t2, leaving=t1) and self.can_take(b, t1, leaving=t2)
+
+    def expired(self, deadline, step):
+        # checked every CHECK_EVERY steps of the day loops; no deadline: never
+        return deadline is not None and step % CHECK_EVERY == 0 and time.time() >= deadline
+
+    # --- construction --------------------------------------------------------
+
+    def construct(self, deadline=None):
+        # days left open at the deadline stay with Void
+        inst = self.instance
+        void = self.void if self.void is not None else 0
+        self.x[:] = False
+        self.owner[:] = void
+        self.x[void] = True
+        for i, t in zip(*np.nonzero(self.must)):
+            self.set_day(t, i)
+        self.costs = np.array([self.doctor_cost(i, self.x[i]) for i in range(self.D)])
+
+        # minimum shift counts first, doctors with the least room first
+        short = [i for i in range(self.D) if self.regular[i] and self.x[i].sum() < inst.min_shifts[i]]
+        room = {i: (self.allowed[i] & ~self.locked).sum() / max(1, inst.min_shifts[i]) for i in short}
+        for i in sorted(short, key=lambda i: room[i]):
+            while self.x[i].sum() < inst.min_shifts[i]:
+                if deadline is not None and time.time() >= deadline:
+                    return
+                best = None
+                for t in np.flatnonzero(~self.locked & ~self.x[i]):
+                    a = self.owner[t]
+                    if a != void and self.regular[a] and self.x[a].sum() <= inst.min_shifts[a]:
+                        continue  # don't take from a doctor who needs the shift too
+                    if self.can_take(i, t):
+                        delta = self.move_delta(t, i)
+                        if best is None or delta[0] < best[1][0]:
+                            best = (t, delta)
+                if best is None:
+                    break
+                self.apply_move(best[0], i, *best[1][1:])
+
+        # every remaining open day: the cheapest doctor, most constrained days first
+        open_days = [t for t in range(self.T) if self.owner[t] == void and not self.locked[t]]
+        candidates = {t: [i for i in range(self.D) if i != void and self.allowed[i, t]] for t in open_days}
+        for step, t in enumerate(sorted(open_days, key=lambda t: len(candidates[t]))):
+            if self.expired(deadline, step):
+                return
+            best = None
+            for i in candidates[t]:
+                if self.can_take(i, t):
+                    delta = self.move_delta(t, i)
+                    if best is None or delta[0] < best[1][0]:
+                        best = (i, delta)
+            if best is not None and best[1][0] < 0:
+                self.apply_move(t, best[0], *best[1][1:])
+
+    # --- local search --------------------------------------------------------
+
+    def descend(self, deadline):
+        # first-improvement moves and swaps until no improving step is left
+        improved = True
+        while improved and time.time() < deadline:
+            improved = False
+            self.iterations += 1
+            for step, t in enumerate(self.rng.permutation(self.T)):
+                if self.expired(deadline, step):
+                    return
+                if self.locked[t]:
+                    continue
+                for b in self.rng.permutation(self.D):
+                    if b == self.owner[t] or not self.can_take(b, t):
+                        continue
+                    delta = self.move_delta(t, b)
+                    if delta[0] < -1e-9:
+                        self.apply_move(t, b, *delta[1:])
+                        improved = True
+                        break
+            if time.time() >= deadline:
+                break
+            for step, t1 in enumerate(self.rng.permutation(self.T)):
+                if self.expired(deadline, step):
+                    return
+                for t2 in self.rng.choice(self.T, size=min(self.T, 24), replace=False):
+                    if not self.can_swap(t1, t2):
+                        continue
+                    delta = self.swap_delta(t1, t2)
+                    if delta[0] < -1e-9:
+                        self.apply_swap(t1, t2, *delta[1:])
+                        improved = True
+            if time.time() >= deadline:
+                break
+
+    def perturb(self, steps):
+        # random feasible moves / swaps, cost ignored
+        for _ in range(steps):
+            t1, t2 = self.rng.integers(self.T, size=2)
+            if self.rng.random() < 0.5 and self.can_swap(t1, t2):
+                self.apply_swap(t1, t2, *self.swap_delta(t1, t2)[1:])
+            elif not self.locked[t1]:
+                b = self.rng.integers(self.D)
+                if b != self.owner[t1] and self.can_take(b, t1):
+                    self.apply_move(t1, b, *self.move_delta(t1, b)[1:])
+
+    def improve(self, deadline):
+        self.descend(deadline)
+        best = (self.costs.sum(), self.x.copy(), self.owner.copy(), self.costs.copy())
+        while time.time() < deadline:
+            self.perturb(max(2, self.T // 20))
+            self.descend(deadline)
+            if self.costs.sum() < best[0] - 1e-9:
+                best = (self.costs.sum(), self.x.copy(), self.owner.copy(), self.costs.copy())
+            else:
+                self.x, self.owner, self.costs = best[1].copy(), best[2].copy(), best[3].copy()
+        self.x, self.owner, self.costs = best[1], best[2], best[3]
+
+    def assignment(self):
+        return [self.instance.doctors[i] for i in self.owner]
+
+
+def solve(instance, time_limit=1.0, seed=0):
+    # greedy schedule improved until time_limit seconds after the start; time_limit=0 gives
+    # the whole greedy one, however long it takes
+    start = time.time()
+    deadline = start + time_limit if time_limit > 0 else None
+    solver = HeuristicSolver(instance, seed=seed)
+    solver.construct(deadline)
+    construct_seconds = time.time() - start
+    construct_objective = solver.objective()
+    if deadline is not None and time.time() < deadline:
+        solver.improve(deadline)
+    return {
+        "assignment": solver.assignment(),
+        "matrix": solver.x.astype(np.int8),  # doctors x days
+        "objective": solver.objective(),
+        "construct_objective": construct_objective,
+        "violations": solver.violations(),
+        "seconds": time.time() - start,
+        "construct_seconds": construct_seconds,
+        "iterations": solver.iterations,
+        "moves": solver.moves,
+    }
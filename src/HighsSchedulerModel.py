@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# SchedulerModel without AMPL: the same (linearized) model is built directly as a sparse
+# matrix and solved in-process with highspy. Same interface as SchedulerModel.
+import numpy as np
+import pandas as pd
+import highspy
+from scipy import sparse
+import Params
+from ProblemInstance import MUST, MUST_NOT
+
+
+class HighsSchedulerModel:
+    def __init__(self, linearized=True, solver="highs", time_limit=None, mip_gap=None):
+        # the matrix form is always the linearized formulation
+        self.linearized = True
+        self.solver = "highs"
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.initial = None
+        self.warm_start = False
+        self.last_data = None
+        self.last_progress = None
+        self.pushed_values = 0
+        self.solver_log = ""
+        self.highs = None
+
+    def set_limits(self, time_limit=None, mip_gap=None):
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+
+    def set_data(self, instance, symmetric_pairs=()):
+        self.doctors = list(instance.doctors)
+        self.days = instance.days
+        self.initial = None
+        self.warm_start = False
+
+        D, T = len(self.doctors), len(self.days)
+        doctor_index = instance.doctor_index
+        weekend = instance.weekend
+
+        min_v, max_v = instance.min_shifts.astype(float), instance.max_shifts.astype(float)
+        pref = instance.preferred_shifts.astype(float)
+        pref_wd = instance.preferred_shifts_weekday.astype(float)
+        pref_we = instance.preferred_shifts_weekend.astype(float)
+        dense, sparse_pref = instance.prefer_dense, instance.prefer_sparse
+        regular = instance.regular
+
+        # columns: x[d, t] = d * T + t, followed by the auxiliary variables
+        cost = [instance.day_cost.ravel()]
+        lower = [(instance.fixed == MUST).astype(float).ravel()]
+        upper = [(instance.fixed != MUST_NOT).astype(float).ravel()]
+        integer = [np.ones(D * T, dtype=bool)]
+        num_col = D * T
+
+        rows, cols, vals = [], [], []
+        row_lower, row_upper = [], []
+        num_row = 0
+
+        def add_rows(count, row_cols, row_vals, lo, hi):
+            # row_cols / row_vals: (count, k) arrays, one row per line
+            nonlocal num_row
+            row_cols, row_vals = np.asarray(row_cols), np.asarray(row_vals, dtype=float)
+            rows.append(np.repeat(np.arange(num_row, num_row + count), row_cols.shape[1]))
+            cols.append(row_cols.ravel())
+            vals.append(np.broadcast_to(row_vals, row_cols.shape).ravel())
+            row_lower.append(np.broadcast_to(np.asarray(lo, dtype=float), (count,)))
+            row_upper.append(np.broadcast_to(np.asarray(hi, dtype=float), (count,)))
+            num_row += count
+
+        def add_columns(count, col_cost, integral):
+            nonlocal num_col
+            first = num_col
+            cost.append(np.broadcast_to(np.asarray(col_cost, dtype=float), (count,)))
+            lower.append(np.zeros(count))
+            upper.append(np.ones(count) if integral else np.full(count, np.inf))
+            integer.append(np.full(count, integral))
+            num_col += count
+            return np.arange(first, first + count)
+
+        x = np.arange(D * T).reshape(D, T)
+
+        # One_Doctor_Per_Day
+        add_rows(T, x.T, 1, 1, 1)
+
+        # Min_Shifts / Max_Shifts (Void excluded)
+        r = np.flatnonzero(regular)
+        add_rows(len(r), x[r], 1, min_v[r], max_v[r])
+
+        # Min_Rest_Period over REST_WINDOW_STARTS = 0 .. max(days) - 2
+        starts = np.arange(max(T - 2, 0))
+        if len(starts):
+            windows = np.stack([x[r][:, starts + k] for k in range(3)], axis=2).reshape(-1, 3)
+            add_rows(len(windows), windows, 1, -np.inf, 1)
+
+        # deviation from the preferred counts: sum x - over + under = preferred
+        def add_deviation(target, day_mask, over_cost, under_cost):
+            sel = np.flatnonzero(target >= 0)
+            if not len(sel):
+                return
+            over = add_columns(len(sel), over_cost, False)
+            under = add_columns(len(sel), under_cost, False)
+            day_cols = x[sel][:, day_mask]
+            row_cols = np.hstack([day_cols, over[:, None], under[:, None]])
+            row_vals = np.hstack([np.ones(day_cols.shape[1]), [-1, 1]])
+            add_rows(len(sel), row_cols, row_vals, target[sel], target[sel])
+
+        all_days = np.ones(T, dtype=bool)
+        add_deviation(pref, all_days, Params.PENALTY_NOT_PREFERRED_SHIFTS, Params.PENALTY_NOT_PREFERRED_SHIFTS)
+        add_deviation(pref_wd, ~weekend, Params.PENALTY_NOT_PREFERRED_SHIFTS, Params.PENALTY_NOT_PREFERRED_SHIFTS)
+        add_deviation(pref_we, weekend, Params.PENALTY_EXCESS_WEEKEND_SHIFT, Params.PENALTY_MISSING_WEEKEND_SHIFT)
+
+        # dense / sparse windows over WINDOW_STARTS = 0 .. max(days) - 4
+        window_starts = np.arange(max(T - 4, 0))
+
+        def add_windows(mask, window_cost, indicator_coef, hi):
+            sel = np.flatnonzero(mask)
+            if not len(sel) or not len(window_starts):
+                return
+            indicators = add_columns(len(sel) * len(window_starts), window_cost, True)
+            day_cols = np.stack([x[sel][:, window_starts + k] for k in range(5)], axis=2).reshape(-1, 5)
+            row_cols = np.hstack([day_cols, indicators[:, None]])
+            row_vals = np.hstack([-np.ones(5) if indicator_coef > 0 else np.ones(5), [indicator_coef]])
+            add_rows(len(row_cols), row_cols, row_vals, -np.inf, hi)
+            windows.append((indicators, day_cols))
+
+        # 2 * w - sum x <= 0 / sum x - 4 * s <= 1
+        windows = []  # (indicator columns, their 5 x columns), to complete MIP starts
+        add_windows(dense, -Params.PENALTY_WRONG_FREQUENCY, 2, 0)
+        add_windows(sparse_pref, Params.PENALTY_WRONG_FREQUENCY, -4, 1)
+
+        # symmetry breaking for interchangeable doctors (a, b): b may not start before a.
+        # started[a, t] <= started[a, t - 1] + x[a, t - 1], started[a, 0] = 0, x[b, t] <= started[a, t]
+        leaders = sorted({doctor_index[a] for a, b in symmetric_pairs})
+        started = {}
+        for a in leaders:
+            started[a] = add_columns(T, 0, False)
+            upper[-1][:] = 1
+            upper[-1][0] = 0
+            if T > 1:
+                row_cols = np.stack([started[a][1:], started[a][:-1], x[a][:-1]], axis=1)
+                add_rows(T - 1, row_cols, [1, -1, -1], -np.inf, 0)
+        for a, b in symmetric_pairs:
+            row_cols = np.stack([x[doctor_index[b]], started[doctor_index[a]]], axis=1)
+            add_rows(T, row_cols, [1, -1], -np.inf, 0)
+
+        matrix = sparse.csc_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(num_row, num_col))
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = num_col
+        lp.num_row_ = num_row
+        lp.col_cost_ = np.concatenate(cost)
+        lp.col_lower_ = np.concatenate(lower)
+        lp.col_upper_ = np.concatenate(upper)
+        lp.row_lower_ = np.concatenate(row_lower)
+        lp.row_upper_ = np.concatenate(row_upper)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = matrix.indptr
+        lp.a_matrix_.index_ = matrix.indices
+        lp.a_matrix_.value_ = matrix.data
+        lp.integrality_ = [highspy.HighsVarType.kInteger if i else highspy.HighsVarType.kContinuous
+                           for i in np.concatenate(integer)]
+        self.lp = lp
+        self.windows = windows
+        self.started = {a: (x[a], columns) for a, columns in started.items()}
+        self.pushed_values = int(matrix.nnz)
+        self.last_data = True
+
+    def reset(self):
+        self.last_data = None
+
+    def is_healthy(self):
+        return True
+
+    def close(self):
+        self.highs = None
+
+    def set_initial_schedule(self, initial):
+        self.initial = initial
+        self.warm_start = True
+
+    def solve(self, progress=None):
+        highs = highspy.Highs()
+        highs.setOptionValue("log_to_console", False)
+        if self.time_limit is not None:
+            highs.setOptionValue("time_limit", float(self.time_limit))
+        if self.mip_gap is not None:
+            highs.setOptionValue("mip_rel_gap", float(self.mip_gap))
+
+        log = []
+        highs.cbLogging.subscribe(lambda e: log.append(e.message))
+        self.last_progress = None
+
+        def on_mip(e):
+            out = e.data_out
+            self.last_progress = {
+                "nodes": int(out.mip_node_count),
+                "bound": out.mip_dual_bound,
+                "incumbent": out.mip_primal_bound,
+                "gap": out.mip_gap * 100,
+                "seconds": out.running_time,
+            }
+            if progress is not None:
+                progress(self.last_progress)
+        highs.cbMipLogging.subscribe(on_mip)
+        highs.cbMipImprovingSolution.subscribe(on_mip)
+
+        highs.passModel(self.lp)
+        if self.initial is not None:
+            solution = highspy.HighsSolution()
+            values = np.zeros(self.lp.num_col_)
+            values[:self.initial.size] = np.ravel(self.initial)
+            # integer auxiliaries follow from x, HiGHS only solves an LP for the rest
+            for indicators, day_cols in self.windows:
+                values[indicators] = values[day_cols].sum(axis=1) >= 2
+            for x_cols, started_cols in self.started.values():
+                values[started_cols] = np.minimum(1, np.concatenate([[0], np.cumsum(values[x_cols])[:-1]]))
+            solution.col_value = values
+            self.start_status = highs.setSolution(solution)
+        highs.run()
+        self.highs = highs
+        self.solver_log = "".join(log)
+
+    def warm_start_accepted(self):
+        if not self.warm_start:
+            return None
+        accepted = self.start_status == highspy.HighsStatus.kOk
+        log = self.solver_log.lower()
+        if "cannot yield feasible solution" in log:
+            accepted = False
+        # HiGHS completes a start with an LP over the continuous columns before the MIP solve
+        completion = log.partition("user-supplied values")[2].partition("solving mip model")[0]
+        if "infeasible" in completion:
+            accepted = False
+        return accepted
+
+    def _values(self):
+        T = len(self.days)
+        values = np.asarray(self.highs.getSolution().col_value)[:len(self.doctors) * T]
+        # no solution (e.g. a limit hit before the first incumbent): nobody on duty
+        if values.size < len(self.doctors) * T:
+            return np.zeros((len(self.doctors), T))
+        return values.reshape(-1, T)
+
+    def get_schedule(self):
+        values = self._values()
+        index = pd.MultiIndex.from_product([self.doctors, self.days])
+        return pd.DataFrame({"x.val": values.ravel()}, index=index)
+
+    def get_assignments(self, doctors, days):
+        values = self._values() > 0.5
+        rows = [self.doctors.index(d) for d in doctors]
+        cols = [self.days.index(day) for day in days]
+        matrix = values[np.ix_(rows, cols)].T.astype(np.int8)
+        assignment = [doctors[row.argmax()] if row.any() else None for row in matrix]
+        return assignment, pd.DataFrame(matrix, index=list(days), columns=list(doctors))
+
+    def get_solve_result(self):
+        status = self.highs.getModelStatus()
+        if status == highspy.HighsModelStatus.kOptimal:
+            return "solved"
+        if status in (highspy.HighsModelStatus.kInfeasible, highspy.HighsModelStatus.kUnboundedOrInfeasible):
+            return "infeasible"
+        if status == highspy.HighsModelStatus.kUnbounded:
+            return "unbounded"
+        if status in (highspy.HighsModelStatus.kTimeLimit, highspy.HighsModelStatus.kIterationLimit,
+                      highspy.HighsModelStatus.kSolutionLimit, highspy.HighsModelStatus.kInterrupt):
+            return "limit"
+        return "failure"
+
+    def get_total_cost(self):
+        return self.highs.getInfo().objective_function_value
+
+    def get_server_log(self):
+        return self.solver_log
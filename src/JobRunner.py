@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Background schedule jobs for the Streamlit app. Every job runs on a worker thread with
+# its own log buffer; the page only polls the job state, so reruns and other sessions
+# never wait for a solve and never share a log.
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job :
+
+    def __init__(self, owner, title):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.title = title
+        self.status = "queued"  # "queued", "running", "done", "failed"
+        self.phase = None
+        self.progress = None  # latest solver progress dict
+        self.lines = []
+        self.error = None
+        self.result = None
+        self.processor = None  # set by the job function, its phase is shown while running
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def log(self, line):
+        with self.lock:
+            self.lines.append(str(line))
+
+    def set_progress(self, progress):
+        self.progress = progress
+
+    def output(self):
+        with self.lock:
+            return "\n".join(self.lines)
+
+    @property
+    def current_phase(self):
+        if self.processor is not None and self.status == "running":
+            return self.processor.phase or self.phase
+        return self.phase
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobRunner :
+
+    def __init__(self, max_workers=2, keep_seconds=3600):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="schedule-job")
+        self.keep_seconds = keep_seconds  # finished jobs are forgotten after this
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, owner, title, target):
+        # target(job) does the work and returns the job result
+        job = Job(owner, title)
+        with self.lock:
+            self.prune()
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, target)
+        return job
+
+    def _run(self, job, target):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = target(job)
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.log(f"❌ {job.error}")
+            job.status = "failed"
+        job.finished = time.time()
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def all(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def latest(self, owner):
+        # most recent job of a session, to reconnect after a rerun
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job.owner == owner]
+        return max(jobs, key=lambda job: job.submitted, default=None)
+
+    def prune(self):
+        # caller holds the lock
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished is not None and now - job.finished > self.keep_seconds:
+                del self.jobs[job_id]
+
+    def stats(self):
+        jobs = self.all()
+        return {status: sum(job.status == status for job in jobs)
+                for status in ("queued", "running", "done", "failed")}
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# Local stand-ins for gspread Client / Spreadsheet / Worksheet objects.
+# Processor only needs get_all_values, update, worksheet(s), add_worksheet,
+# del_worksheet and weekend formatting, so rosters stored as XLSX workbooks or
+# directories of CSV files can be solved without touching Google Sheets.
+# XLSX workbooks are updated in place: sheets created by the run (-full-sched,
+# -short-sched) are written whole, in every other sheet only the cells the run changed
+# (e.g. the validation row) are rewritten, so formulas, formats and sheet settings of
+# the planner's workbook are kept. Writes only change the in-memory sheets; flush() (called
+# by Processor.commit_writes) saves them to disk once per run.
+import csv
+from copy import copy
+import os
+import re
+from datetime import date, datetime
+
+import openpyxl
+from openpyxl.styles import Font
+
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+def a1_to_index(cell):
+    # "B3" -> (2, 1), zero-based (row, col)
+    match = re.fullmatch(r"\$?([A-Za-z]+)\$?(\d+)", cell.strip())
+    if match is None:
+        raise ValueError(f"Unsupported cell reference: {cell}")
+    letters, digits = match.groups()
+    col = 0
+    for c in letters.upper():
+        col = col * 26 + (ord(c) - 64)
+    return int(digits) - 1, col - 1
+
+
+def cell_to_string(value):
+    # mimic the formatted values returned by the Sheets API
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class LocalWorksheet :
+
+    def __init__(self, spreadsheet, title, values=None, sheet_id=0):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.values = [[cell_to_string(v) for v in row] for row in (values or [])]
+        self.text_colors = {}  # (row, col) -> {"red": .., "green": .., "blue": ..}
+        self.dirty = set()  # (row, col) changed since the last save
+        self.created = False  # added after loading, saved as a whole
+
+    def get_all_values(self):
+        rows = [list(row) for row in self.values]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def update(self, *args, **kwargs):
+        # accepts both update(values, range_name) and the legacy update(range_name, values)
+        range_name = kwargs.get("range_name")
+        values = kwargs.get("values")
+        for arg in args:
+            if isinstance(arg, str):
+                range_name = arg
+            else:
+                values = arg
+
+        row, col = a1_to_index(range_name.split(":")[0]) if range_name else (0, 0)
+        for i, new_row in enumerate(values or []):
+            for j, value in enumerate(new_row):
+                self.set_cell(row + i, col + j, value)
+        self.spreadsheet.changed()
+
+    def set_cell(self, row, col, value):
+        while len(self.values) <= row:
+            self.values.append([])
+        target = self.values[row]
+        while len(target) <= col:
+            target.append("")
+        value = cell_to_string(value)
+        if target[col] != value:
+            target[col] = value
+            self.dirty.add((row, col))
+
+    def set_text_color(self, cells, color):
+        for cell in cells:
+            self.text_colors[a1_to_index(cell)] = color
+            self.dirty.add(a1_to_index(cell))
+        self.spreadsheet.changed()
+
+
+class LocalSpreadsheet :
+    # in-memory spreadsheet; subclasses persist it to disk in save(), called by flush()
+
+    def __init__(self, title, worksheets=None):
+        self.title = title
+        self.id = title
+        self.revision = 0
+        self.unsaved = False
+        self._worksheets = [LocalWorksheet(self, name, values, sheet_id)
+                            for sheet_id, (name, values) in enumerate((worksheets or {}).items())]
+
+    def get_lastUpdateTime(self):
+        # stands in for the Drive modifiedTime: changes with every write
+        return str(self.revision)
+
+    def changed(self):
+        self.revision += 1
+        self.unsaved = True
+
+    def flush(self):
+        # write the changes since the last flush to disk, once
+        if self.unsaved:
+            self.save()
+            self.unsaved = False
+
+    def worksheets(self):
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        for ws in self._worksheets:
+            if ws.title == title:
+                return ws
+        raise WorksheetNotFound(title)
+
+    def add_worksheet(self, title, rows=None, cols=None):
+        if any(ws.title == title for ws in self._worksheets):
+            raise Exception(f"A sheet with the name \"{title}\" already exists")
+        ws = LocalWorksheet(self, title, sheet_id=max((w.id for w in self._worksheets), default=-1) + 1)
+        ws.created = True
+        self._worksheets.append(ws)
+        self.changed()
+        return ws
+
+    def del_worksheet(self, worksheet):
+        self._worksheets = [ws for ws in self._worksheets if ws.title != worksheet.title]
+        self.changed()
+
+    def batch_update(self, body):
+        # the subset of spreadsheets.batchUpdate requests written by WritePlan
+        by_id = {ws.id: ws for ws in self._worksheets}
+        for request in body["requests"]:
+            if "addSheet" in request:
+                properties = request["addSheet"]["properties"]
+                if any(ws.title == properties["title"] for ws in self._worksheets):
+                    raise Exception(f"A sheet with the name \"{properties['title']}\" already exists")
+                ws = LocalWorksheet(self, properties["title"], sheet_id=properties["sheetId"])
+                ws.created = True
+                self._worksheets.append(ws)
+                by_id[ws.id] = ws
+            elif "deleteSheet" in request:
+                sheet_id = request["deleteSheet"]["sheetId"]
+                self._worksheets = [ws for ws in self._worksheets if ws.id != sheet_id]
+            elif "updateCells" in request:
+                update = request["updateCells"]
+                ws = by_id[update["range"]["sheetId"]]
+                row, col = update["range"]["startRowIndex"], update["range"]["startColumnIndex"]
+                with_format = "userEnteredFormat" in update["fields"]
+                for i, cells in enumerate(update["rows"]):
+                    for j, cell in enumerate(cells["values"]):
+                        ws.set_cell(row + i, col + j, cell.get("userEnteredValue", {}).get("stringValue", ""))
+                        if with_format:
+                            color = cell.get("userEnteredFormat", {}).get("textFormat", {}).get("foregroundColor")
+                            if ws.text_colors.get((row + i, col + j)) != color:
+                                ws.dirty.add((row + i, col + j))
+                            if color is None:
+                                ws.text_colors.pop((row + i, col + j), None)
+                            else:
+                                ws.text_colors[(row + i, col + j)] = color
+            elif "updateSheetProperties" in request:
+                pass  # local sheets grow as needed
+            else:
+                raise Exception(f"Unsupported batch_update request: {list(request)}")
+        self.changed()
+        return {"replies": [{} for _ in body["requests"]]}
+
+    def save(self):
+        pass
+
+
+class CsvSpreadsheet(LocalSpreadsheet) :
+    # a directory of CSV files, one file per worksheet; formatting is kept in memory only
+
+    def __init__(self, path):
+        self.path = path
+        worksheets = {}
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(".csv"):
+                with open(os.path.join(path, name), newline="", encoding="utf-8") as f:
+                    worksheets[name[:-4]] = list(csv.reader(f))
+        super().__init__(os.path.basename(os.path.normpath(path)), worksheets)
+        self.id = path
+
+    def save(self):
+        titles = {ws.title for ws in self._worksheets}
+        for name in os.listdir(self.path):
+            if name.lower().endswith(".csv") and name[:-4] not in titles:
+                os.remove(os.path.join(self.path, name))
+        for ws in self._worksheets:
+            with open(os.path.join(self.path, ws.title + ".csv"), "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(ws.values)
+
+
+class XlsxSpreadsheet(LocalSpreadsheet) :
+
+    def __init__(self, path):
+        self.path = path
+        workbook = openpyxl.load_workbook(path, data_only=True)
+        worksheets = {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)]
+                      for sheet in workbook.worksheets}
+        super().__init__(os.path.splitext(os.path.basename(path))[0], worksheets)
+        self.id = path
+        # keep the text colours, result sheets are now updated in place
+        for sheet in workbook.worksheets:
+            ws = self.worksheet(sheet.title)
+            for row in sheet.iter_rows():
+                for cell in row:
+                    color = cell.font.color if cell.font is not None else None
+                    if color is not None and color.type == "rgb" and isinstance(color.rgb, str):
+                        rgb = color.rgb[-6:]
+                        ws.text_colors[(cell.row - 1, cell.column - 1)] = {
+                            c: int(rgb[k:k + 2], 16) / 255 for c, k in (("red", 0), ("green", 2), ("blue", 4))}
+
+    def save(self):
+        # reopened with formulas and styles, see the module comment
+        workbook = openpyxl.load_workbook(self.path)
+        titles = {ws.title for ws in self._worksheets}
+        for sheet in list(workbook.worksheets):
+            if sheet.title not in titles:
+                workbook.remove(sheet)
+        for ws in self._worksheets:
+            if ws.created or ws.title not in workbook.sheetnames:
+                index = workbook.sheetnames.index(ws.title) if ws.title in workbook.sheetnames else None
+                if index is not None:
+                    workbook.remove(workbook[ws.title])
+                sheet = workbook.create_sheet(ws.title, index)
+                for row in ws.values:
+                    sheet.append(row)
+                cells = ws.text_colors
+            else:
+                sheet = workbook[ws.title]
+                for row, col in ws.dirty:
+                    value = ws.values[row][col] if row < len(ws.values) and col < len(ws.values[row]) else ""
+                    sheet.cell(row=row + 1, column=col + 1).value = value if value != "" else None
+                cells = {cell: ws.text_colors.get(cell) for cell in ws.dirty}
+            for (row, col), color in cells.items():
+                cell = sheet.cell(row=row + 1, column=col + 1)
+                font = copy(cell.font)
+                font.color = None if color is None else \
+                    "".join(f"{int(round(color.get(c, 0) * 255)):02X}" for c in ("red", "green", "blue"))
+                cell.font = font
+        if not workbook.worksheets:
+            workbook.create_sheet("Sheet1")
+        workbook.save(self.path)
+        for ws in self._worksheets:
+            ws.dirty.clear()
+
+
+class LocalClient :
+    # every *.xlsx file and every subdirectory with *.csv files under root is a spreadsheet
+
+    def __init__(self, root):
+        self.root = root
+
+    def openall(self):
+        spreadsheets = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if name.lower().endswith(".xlsx") and not name.startswith("~$"):
+                spreadsheets.append(XlsxSpreadsheet(path))
+            elif os.path.isdir(path) and any(f.lower().endswith(".csv") for f in os.listdir(path)):
+                spreadsheets.append(CsvSpreadsheet(path))
+        return spreadsheets
+
+    def open(self, title):
+        for ss in self.openall():
+            if ss.title == title:
+                return ss
+        raise Exception(f"Spreadsheet not found: {title}")
+
+
+class InMemoryClient :
+    # client over LocalSpreadsheet objects that never touch the disk, e.g. to exercise
+    # SheetsCache; counts the calls a real client would send to the API
+    def __init__(self, spreadsheets=None):
+        self.spreadsheets = list(spreadsheets or [])
+        self.calls = 0
+
+    def openall(self):
+        self.calls += 1
+        return list(self.spreadsheets)
+
+    def open(self, title):
+        self.calls += 1
+        for ss in self.spreadsheets:
+            if ss.title == title:
+                return ss
+        raise Exception(f"Spreadsheet not found: {title}")
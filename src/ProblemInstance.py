@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# One scheduling problem as arrays: doctors x days matrices for preferences and fixed
+# cells plus one vector per doctor parameter. Rows follow `doctors` ("Void" last),
+# columns are day indices 0 .. num_days - 1.
+import copy
+from datetime import datetime
+import numpy as np
+import Params
+
+# fixed cell states
+FREE = -1
+MUST_NOT = 0
+MUST = 1
+FIXED_SYMBOLS = {FREE: ".", MUST_NOT: "0", MUST: "1"}  # AMPL fixed_shift values
+
+# preference cell states
+RELUCTANT = -1
+NEUTRAL = 0
+WILLING = 1
+
+# parameter row -> (vector dtype, parser); missing cells get the parser's value for ""
+PARAM_ROWS = {
+    "enabled": (bool, lambda val: val.upper() == 'TRUE'),
+    "min_shifts": (int, lambda val: parse_int_with_default(val, Params.DEFAULT_MIN)),
+    "preferred_shifts": (int, lambda val: parse_int_with_default(val, Params.NO_PREFERENCE)),
+    "max_shifts": (int, lambda val: parse_int_with_default(val, Params.DEFAULT_MAX_SHIFTS)),
+    "preferred_shifts_weekday": (int, lambda val: parse_int_with_default(val, Params.NO_PREFERENCE)),
+    "preferred_shifts_weekend": (int, lambda val: parse_int_with_default(val, Params.NO_PREFERENCE)),
+    "prefer_sparse": (bool, lambda val: val.upper() == 'TRUE'),
+    "prefer_dense": (bool, lambda val: val.upper() == 'TRUE'),
+}
+
+# parameters of the "Void" doctor that absorbs unfilled days
+VOID_PARAMS = {
+    "enabled": True,
+    "min_shifts": 0,
+    "preferred_shifts": 0,
+    "max_shifts": Params.DEFAULT_MAX_SHIFTS,
+    "preferred_shifts_weekday": Params.NO_PREFERENCE,
+    "preferred_shifts_weekend": Params.NO_PREFERENCE,
+    "prefer_sparse": False,
+    "prefer_dense": False,
+}
+
+
+def parse_int_with_default(val, default):
+    try:
+        return int(val)
+    except:
+        return default
+
+def parse_date_flex(date_str):
+    # Usuń spacje, zamień nietypowe separatory na '-'
+    cleaned = ''.join(c if c.isalnum() else '-' for c in date_str.strip())
+    # Przykładowe formaty dat
+    formats = [
+        "%Y-%m-%d",  # 2025-05-01
+        "%d-%m-%Y",  # 01-05-2025
+        "%m-%d-%Y",  # 05-01-2025 (ostrożnie, bo kolizja z dd-mm)
+        "%d-%b-%Y",  # 01-May-2025
+    ]
+    for fmt in formats:
+        try:
+            return datetime.strptime(cleaned, fmt)
+        except ValueError:
+            continue
+    # Jeśli nie udało się sparsować
+    return None
+
+
+class ProblemInstance :
+
+    def __init__(self, doctors, date_labels, dates=None, weekend=None):
+        self.doctors = list(doctors)
+        self.doctor_index = {d: i for i, d in enumerate(self.doctors)}
+        self.date_labels = list(date_labels)
+        self.num_days = len(self.date_labels)
+        self.dates = list(dates) if dates is not None else [None] * self.num_days
+        self.weekend = np.zeros(self.num_days, dtype=bool) if weekend is None else np.asarray(weekend, dtype=bool)
+        self.param_row_indices = {}
+
+        D, T = len(self.doctors), self.num_days
+        self.fixed = np.full((D, T), FREE, dtype=np.int8)
+        self.preference = np.full((D, T), NEUTRAL, dtype=np.int8)
+        for name, (dtype, parser) in PARAM_ROWS.items():
+            setattr(self, name, np.full(D, parser(""), dtype=dtype))
+        self.enabled[:] = True
+        self.set_void_params()
+
+    @classmethod
+    def from_rows(cls, data, log=print):
+        # worksheet values: doctor header, parameter rows, then one row per date
+        doctors = data[0][1:] + ["Void"]
+        num_doctors = len(doctors) - 1
+
+        param_rows = {}
+        param_row_indices = {}
+        start_of_schedule = None
+        for i, row in enumerate(data[1:], start=1):
+            label = row[0].strip().lower()
+            if label in PARAM_ROWS or label == "validation_result":
+                param_row_indices[label] = i
+                param_rows[label] = row[1:num_doctors + 1]
+            else:
+                start_of_schedule = i
+                break  # First unrecognized label = start of scheduling rows
+
+        if start_of_schedule is None:
+            raise Exception("No schedule section found in the worksheet")
+
+        date_labels, dates, weekend, cells = [], [], [], []
+        for row in data[start_of_schedule:]:
+            if not any(cell.strip() for cell in row):
+                continue  # skip empty rows
+
+            date_str = row[0].strip()
+            if not date_str:
+                continue
+
+            date_labels.append(date_str)
+            parsed_date = parse_date_flex(date_str)
+            if parsed_date:
+                dates.append(parsed_date)
+                weekend.append(parsed_date.weekday() >= 5)  # 5=Saturday, 6=Sunday
+            else :
+                log(f"⚠️ Could not parse date '{date_str}', skipping row.")
+                dates.append(None)
+                weekend.append(False)
+            cells.append(row[1:num_doctors + 1])
+
+        instance = cls(doctors, date_labels, dates, weekend)
+        instance.param_row_indices = param_row_indices
+        for label, values in param_rows.items():
+            if label in PARAM_ROWS:
+                parser = PARAM_ROWS[label][1]
+                getattr(instance, label)[:len(values)] = [parser(val) for val in values]
+        instance.set_void_params()
+
+        for day, entries in enumerate(cells):
+            for i, entry in enumerate(entries):
+                value = entry.strip().lower()
+                if value == "nie" or value == "must not" :
+                    instance.fixed[i, day] = MUST_NOT
+                elif value == "tak" or value == "must" :
+                    instance.fixed[i, day] = MUST
+                if value == "chętnie" or value == "willing" :
+                    instance.preference[i, day] = WILLING
+                elif value == "niechętnie" or value == "reluctant" :
+                    instance.preference[i, day] = RELUCTANT
+        return instance
+
+    def set_void_params(self):
+        void = self.doctor_index.get("Void")
+        if void is not None:
+            for name, value in VOID_PARAMS.items():
+                getattr(self, name)[void] = value
+
+    @property
+    def days(self):
+        return list(range(self.num_days))
+
+    @property
+    def regular(self):
+        # every doctor except "Void"
+        return np.array([d != "Void" for d in self.doctors], dtype=bool)
+
+    @property
+    def day_cost(self):
+        # doctors x days cost, from the current Params weights
+        cost = Params.BASE_COST - Params.PENALTY_MODIFIER_WILLING * self.preference.astype(float)
+        cost[~self.regular] = Params.COST_VOID
+        return cost
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def subset(self, mask):
+        # only the doctors where mask is True (e.g. instance.enabled), one indexing per array
+        mask = np.asarray(mask, dtype=bool)
+        instance = copy.copy(self)
+        instance.doctors = [d for d, keep in zip(self.doctors, mask) if keep]
+        instance.doctor_index = {d: i for i, d in enumerate(instance.doctors)}
+        instance.fixed = self.fixed[mask]
+        instance.preference = self.preference[mask]
+        for name in PARAM_ROWS:
+            setattr(instance, name, getattr(self, name)[mask])
+        return instance
+
+    def slice_days(self, start, end):
+        # days [start, end) renumbered from 0
+        instance = copy.copy(self)
+        instance.date_labels = self.date_labels[start:end]
+        instance.dates = self.dates[start:end]
+        instance.num_days = len(instance.date_labels)
+        instance.weekend = self.weekend[start:end].copy()
+        instance.fixed = self.fixed[:, start:end].copy()
+        instance.preference = self.preference[:, start:end].copy()
+        for name in PARAM_ROWS:
+            setattr(instance, name, getattr(self, name).copy())
+        return instance
@@ -2,164 +2,154 @@
 from amplpy import AMPL
 import amplpy
 from SchedulerModel import SchedulerModel
+from ProblemInstance import ProblemInstance, MUST, MUST_NOT, FREE
+from HighsSchedulerModel import HighsSchedulerModel
+import SolverPortfolio
+import HeuristicSolver
+import ScheduleScorer
+import FeasibilityCheck
+from SolutionCache import SolutionCache
+from RunReport import RunReport
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
-from gspread_formatting import CellFormat, TextFormat, format_cell_ranges
+from WritePlan import WritePlan, RED
 import Params
 from collections import Counter
 from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+import json
+import numpy as np
+import pandas as pd
 
 
-# Domyślne wartości
-
-
-def parse_int_with_default(val, default):
+def read_prior_schedule( spreadsheet, title ) :
+    # "{title}-full-sched" from the previous run, if there is one
     try:
-        return int(val)
+        return spreadsheet.worksheet(f"{title}-full-sched").get_all_values()
     except:
-        return default
-    
-def parse_date_flex(date_str):
-    # Usuń spacje, zamień nietypowe separatory na '-'
-    cleaned = ''.join(c if c.isalnum() else '-' for c in date_str.strip())
-    # Przykładowe formaty dat
-    formats = [
-        "%Y-%m-%d",  # 2025-05-01
-        "%d-%m-%Y",  # 01-05-2025
-        "%m-%d-%Y",  # 05-01-2025 (ostrożnie, bo kolizja z dd-mm)
-        "%d-%b-%Y",  # 01-May-2025
-    ]
-    for fmt in formats:
-        try:
-            return datetime.strptime(cleaned, fmt)
-        except ValueError:
-            continue
-    # Jeśli nie udało się sparsować
-    return None
+        return None
+
+# Processor attributes that the app, the batch run and the service let the user choose
+SETTINGS = ("backend", "linearized", "symmetry_breaking", "solvers", "rolling_horizon", "heuristic_start")
+
+def add_settings_arguments( parser ) :
+    parser.add_argument("--linearized", action="store_true", help="linearized objective (explicit deviation variables)")
+    parser.add_argument("--symmetry", action="store_true", help="order interchangeable doctors to cut symmetric branches")
+    parser.add_argument("--rolling", default=None, metavar="BLOCK,OVERLAP",
+                        help="solve in blocks of BLOCK days overlapping by OVERLAP days, e.g. 35,7")
+    parser.add_argument("--solvers", default=None, metavar="S1,S2",
+                        help="race these solvers (one name: use it instead of HiGHS)")
+    parser.add_argument("--heuristic-start", action="store_true",
+                        help="start the MIP from the heuristic schedule when there is no previous one")
+
+def settings_from_arguments( args ) :
+    settings = {
+        "linearized": args.linearized,
+        "symmetry_breaking": args.symmetry,
+        "heuristic_start": args.heuristic_start,
+    }
+    if args.rolling:
+        block, overlap = args.rolling.split(",")
+        settings["rolling_horizon"] = (int(block), int(overlap))
+    if args.solvers:
+        settings["solvers"] = [name.strip() for name in args.solvers.split(",") if name.strip()]
+    if getattr(args, "backend", None):
+        settings["backend"] = args.backend
+    return settings
+
+def flush_spreadsheet( spreadsheet ) :
+    # local spreadsheets keep writes in memory until flush(); gspread writes are already sent
+    flush = getattr( spreadsheet, "flush", None )
+    if flush is not None:
+        flush()
 
 class Processor :
 
     def __init__(self ):
-        self.fixed_shifts = {}  # (doctor, day_index) -> "0" / "1"
-        self.day_cost = {}
-        self.date_labels = []
-        self.dates = []
-        self.weekend = []
+        self.instance = None  # ProblemInstance of the loaded worksheet
+        self.validation_row = None
+        self.validation_result_row_index = None
+        self.feasibility = None
+        self.linearized = False  # SchedulerModel objective formulation
+        self.symmetry_breaking = False  # order interchangeable doctors to cut symmetric branches
+        self.symmetry_classes = []
+        self.backend = "ampl"  # "ampl" (SchedulerModel) or "highs" (in-process highspy, no AMPL)
+        self.warm_start = True  # start the MIP from the previous -full-sched result
+        self.prior_schedule = None
+        self.model = None  # long-lived SchedulerModel reused between runs, if any
+        self.solvers = None  # e.g. ["highs", "scip"]: race them instead of a single HiGHS solve
+        self.portfolio_deadline = None  # seconds
+        self.rolling_horizon = None  # (block_days, overlap_days), e.g. (35, 7) for long horizons
+        self.compare_monolithic = False  # also solve the whole horizon at once and report the gap
+        self.time_limit = None  # seconds; the best schedule found so far is exported when hit
+        self.heuristic_seconds = 1.0  # local search budget of HeuristicSolver
+        self.heuristic_start = False  # start the MIP from the heuristic schedule when there is no prior one
+        self.heuristic_fallback = True  # export the heuristic schedule when no MIP solver can be started
+        self.method = None  # "mip" or "heuristic": what produced the current schedule
+        self.heuristic_cost = None
+        self.mip_gap = None  # relative MIP gap at which the solve may stop
+        self.cache = None  # SolutionCache: identical instances + settings reuse the stored schedule
+        self.force_solve = False  # ignore a cached schedule and solve again
+        self.cache_hit = False
+        self.optimal = True
+        self.gap = None
+        self.progress = None
+        self.phase = None  # "loading", "validating", "solving", "exporting", "done"
+        self.write_plan = None  # WritePlan collecting this run's writes, see begin_writes()
+        self.report = RunReport()  # phase timings and solver statistics of this run
         self.log = lambda l : print(l)
 
     def set_logging( self, logging ) :
         self.log = logging
 
+    def set_model( self, model ) :
+        self.model = model
+
+    def set_progress( self, progress ) :
+        # progress(dict) receives incumbent / bound / gap while the solver runs
+        self.progress = progress
+
     def load_worksheet( self, spreadsheet, worksheet ) :
         self.log("Loading worksheet ...")
         # Read data as list of lists
         self.spreadsheet = spreadsheet
         self.worksheet = worksheet
-        data = worksheet.get_all_values()
-
-        # Doctor identifiers (we skip the first header column)
-        self.doctors = data[0][1:]
-        self.doctors.append("Void")
-
-        self.enabled = {}
-        self.min_shifts = {}
-        self.preferred_shifts = {}
-        self.max_shifts = {}
-        self.preferred_shifts_weekday = {}
-        self.preferred_shifts_weekend = {}
-        self.prefer_sparse = {}
-        self.prefer_dense = {}
-
-        # Recognized parameter rows mapped to variables and parsers
-        param_rows = {
-            "enabled": (self.enabled, lambda val: val.upper() == 'TRUE'),
-            "min_shifts": (self.min_shifts, lambda val: parse_int_with_default(val, Params.DEFAULT_MIN)),
-            "preferred_shifts": (self.preferred_shifts, lambda val: parse_int_with_default(val, Params.NO_PREFERENCE)),
-            "max_shifts": (self.max_shifts, lambda val: parse_int_with_default(val, Params.DEFAULT_MAX_SHIFTS)),
-            "preferred_shifts_weekday": (self.preferred_shifts_weekday, lambda val: parse_int_with_default(val, Params.NO_PREFERENCE)),
-            "preferred_shifts_weekend": (self.preferred_shifts_weekend, lambda val: parse_int_with_default(val, Params.NO_PREFERENCE)),
-            "prefer_sparse": (self.prefer_sparse, lambda val: val.upper() == 'TRUE'),
-            "prefer_dense": (self.prefer_dense, lambda val: val.upper() == 'TRUE'),
-            "validation_result": (None, None)  # handled separately
-        }
+        self.report.set( spreadsheet=spreadsheet.title, worksheet=worksheet.title )
+        self.load_data( worksheet.get_all_values() )
+        if self.warm_start:
+            self.prior_schedule = read_prior_schedule( spreadsheet, worksheet.title )
+
+    def load_data( self, data ) :
+        self.instance = ProblemInstance.from_rows( data, log=self.log )
+        self.param_row_indices = self.instance.param_row_indices
+        self.validation_result_row_index = self.param_row_indices.get("validation_result", None)
 
-        # Dynamically parse parameter rows by header
-        self.param_row_indices = {}
-        start_of_schedule = None
-        for i, row in enumerate(data[1:], start=1):
-            label = row[0].strip().lower()
-            if label in param_rows:
-                self.param_row_indices[label] = i
-                target, parser = param_rows[label]
-                if target is not None:
-                    target.update(zip(self.doctors, [parser(val) for val in row[1:]]))
-            else:
-                start_of_schedule = i
-                break  # First unrecognized label = start of scheduling rows
+        for i, day in np.argwhere(self.instance.fixed == MUST):
+            self.log("MUST: {}, {}".format(self.doctors[i], day) )
+        self.log("day_cost for {}: {}".format(self.doctors[0], self.instance.day_cost[0].tolist()))
 
-        self.validation_result_row_index = self.param_row_indices.get("validation_result", None)
+    # the loaded instance, shared with the exports
+    @property
+    def doctors( self ) :
+        return self.instance.doctors
 
-        if start_of_schedule is None:
-            raise Exception("No schedule section found in the worksheet")
-        
-        day_index = 0
-        for row in data[start_of_schedule:]:
-            if not any(cell.strip() for cell in row):
-                continue  # skip empty rows
+    @property
+    def days( self ) :
+        return self.instance.days
 
-            date_str = row[0].strip()
-            if not date_str:
-                continue
+    @property
+    def date_labels( self ) :
+        return self.instance.date_labels
 
-            self.date_labels.append(date_str)
-
-            parsed_date = parse_date_flex(date_str)
-            if parsed_date:
-                self.dates.append(parsed_date)
-                self.weekend.append(1 if parsed_date.weekday() >= 5 else 0)  # 5=Saturday, 6=Sunday
-            else :
-                print(f"⚠️ Could not parse date '{date_str}', skipping row.")
-                self.dates.append(None)
-                self.weekend.append(0)
-            entries = row[1:]
-
-            for i, entry in enumerate(entries):
-                doctor = self.doctors[i]
-                value = entry.strip().lower()
-
-                if value == "nie" or value == "must not" :
-                    self.fixed_shifts[(doctor, day_index)] = "0"
-                elif value == "tak" or value == "must" :
-                    self.fixed_shifts[(doctor, day_index)] = "1"
-                    print("MUST: {}, {}".format(doctor, day_index) )
-                if value == "chętnie" or value == "willing" :
-                    self.day_cost[(doctor, day_index)] = Params.BASE_COST - Params.PENALTY_MODIFIER_WILLING
-                elif value == "niechętnie" or value == "reluctant" :
-                    self.day_cost[(doctor, day_index)] = Params.BASE_COST + Params.PENALTY_MODIFIER_WILLING
-                else:
-                    self.day_cost[(doctor, day_index)] = Params.BASE_COST
-            
-            day_index += 1
-
-        self.days = list(range(day_index))
-
-        for d in self.doctors:
-            for day in self.days:
-                if (d, day) not in self.day_cost or self.day_cost[(d,day)] == None:
-                    self.day_cost[(d, day)] = 10 * Params.BASE_COST if d == "Void" else Params.BASE_COST
-
-        # add Void doctor with parameters
-        self.min_shifts["Void"] = 0
-        self.preferred_shifts["Void"] = 0
-        self.preferred_shifts_weekday["Void"] = Params.NO_PREFERENCE
-        self.preferred_shifts_weekend["Void"] = Params.NO_PREFERENCE
-        self.max_shifts["Void"] = Params.DEFAULT_MAX_SHIFTS
-        self.prefer_dense["Void"] = False
-        self.prefer_sparse["Void"] = False
-
-        print("day_cost for {}: {}".format(self.doctors[0],
-            [ self.day_cost.get((self.doctors[0], day), None) for day in self.days ]))
+    @property
+    def dates( self ) :
+        return self.instance.dates
+
+    @property
+    def weekend( self ) :
+        return self.instance.weekend
 
     def validate_log(self, doc, message) :
         idx = self.doctor_index.get(doc)
@@ -168,47 +158,46 @@ class Processor :
                 self.validation_row[idx] += "\n"
             self.validation_row[idx] += message
 
-    def validate_disabled_doctors( self ) :    
-        for doc in self.doctors[:-1]:
-            if not self.enabled.get(doc, True):
-                self.validate_log(doc, "⚠️ doctor disabled")
+    def validate_disabled_doctors( self ) :
+        for i in np.flatnonzero(~self.instance.enabled[:-1]):
+            self.validate_log(self.doctors[i], "⚠️ doctor disabled")
 
     def validate_shift_ranges(self):
-        for doc in self.doctors[:-1]:
-            min_val = self.min_shifts.get(doc)
-            preferred_val = self.preferred_shifts.get(doc)
-            max_val = self.max_shifts.get(doc)
+        inst = self.instance
+        for i, doc in enumerate(self.doctors[:-1]):
+            min_val = inst.min_shifts[i]
+            preferred_val = inst.preferred_shifts[i]
+            max_val = inst.max_shifts[i]
 
             if min_val > max_val:
                 self.validate_log(doc, f"🚫 min_shifts > max_shifts ({min_val} > {max_val})")
 
-            if preferred_val is not None and preferred_val >= 0:
+            if preferred_val >= 0:
                 if min_val > preferred_val:
                     self.validate_log(doc, f"⚠️ min_shifts > preferred_shifts ({min_val} > {preferred_val})")
 
-            if preferred_val is not None and preferred_val >= 0:
+            if preferred_val >= 0:
                 if preferred_val > max_val:
                     self.validate_log(doc, f"⚠️ preferred_shifts > max_shifts ({preferred_val} > {max_val})")
 
     def validate_preference_conflict(self):
-        for doc in self.doctors[:-1]:  # skip 'Void'
-            ps = self.preferred_shifts.get(doc, Params.NO_PREFERENCE)
-            psw = self.preferred_shifts_weekday.get(doc, Params.NO_PREFERENCE)
-            pswe = self.preferred_shifts_weekend.get(doc, Params.NO_PREFERENCE)
-            count = sum(p != Params.NO_PREFERENCE for p in [ps, psw, pswe])
-            if count > 2:
-                self.validate_log(doc, "🚫 conflicting preferred_shifts/preferred_shifts_weekday/preferred_shifts_weekend settings")
+        inst = self.instance
+        count = ((inst.preferred_shifts != Params.NO_PREFERENCE).astype(int)
+                 + (inst.preferred_shifts_weekday != Params.NO_PREFERENCE)
+                 + (inst.preferred_shifts_weekend != Params.NO_PREFERENCE))
+        for i in np.flatnonzero(count[:-1] > 2):  # skip 'Void'
+            self.validate_log(self.doctors[i], "🚫 conflicting preferred_shifts/preferred_shifts_weekday/preferred_shifts_weekend settings")
 
     def validate_sparse_dense_conflict(self):
-        for doc in self.doctors[:-1]:  # skip 'Void'
-            if self.prefer_sparse.get(doc, False) and self.prefer_dense.get(doc, False):
-                self.validate_log(doc, "🚫 both sparse and dense preferences set")
+        both = self.instance.prefer_sparse & self.instance.prefer_dense
+        for i in np.flatnonzero(both[:-1]):  # skip 'Void'
+            self.validate_log(self.doctors[i], "🚫 both sparse and dense preferences set")
 
     def validate_minimum_active_doctors(self, minimum_required=3):
-        active_doctors = [doc for doc in self.doctors[:-1] if self.enabled.get(doc, True)]
-        if len(active_doctors) < minimum_required:
+        active_doctors = int(self.instance.enabled[:-1].sum())
+        if active_doctors < minimum_required:
             for doc in self.doctors[:-1]:
-                self.validate_log(doc, f"🚫 not enough active doctors ({len(active_doctors)} total)")
+                self.validate_log(doc, f"🚫 not enough active doctors ({active_doctors} total)")
 
     def validate_duplicate_doctor_names(self):
         name_counts = Counter(self.doctors[:-1])  # pomijamy "Void"
@@ -242,43 +231,31 @@ class Processor :
             missing_str = ", ".join(d.strftime("%Y-%m-%d") for d in missing_days)
             self.log(f"⚠️ Missing dates in schedule: {missing_str}")
 
-    def validate_min_feasibility(self):
-        for doctor in self.doctors[:-1]:
-            if not self.enabled.get(doctor, True):
-                continue
-            min_required = self.min_shifts.get(doctor, 0)
-            if min_required <= 0:
-                continue
-            possible = 0
-            day = 0
-            while day < len(self.days):
-                while day < len(self.days):
-                    val = self.fixed_shifts.get((doctor, day), ".")
-                    if val != "0":
-                        break
-                    day += 1
-                if day >= len(self.days):
-                    break
-                possible += 1
-                if possible >= min_required:
-                    break
-                day += 3
-            if possible < min_required:
-                self.validate_log(doctor, f"🚫 only {possible} feasible days for min={min_required}")            
-
-    def validate_input(self):
+    def check_feasibility(self):
+        start = time.time()
+        self.feasibility = FeasibilityCheck.check_feasibility( self.instance )
+        self.log("Feasibility pre-check: {:.1f} ms, {}".format(
+            (time.time() - start) * 1000, "infeasible" if self.feasibility.infeasible else "no conflict found"))
+
+    def validate_feasibility(self):
+        self.check_feasibility()
+        for doctor, messages in self.feasibility.reasons.items():
+            for message in messages:
+                self.validate_log(doctor, message)
+
+    def ensure_feasible(self):
+        # stop before the MIP is launched when the pre-check proved infeasibility
+        if self.feasibility is None:
+            self.check_feasibility()
+        if self.feasibility.infeasible:
+            raise Exception("Infeasible input, see validation_result: " + "; ".join(self.feasibility.summary()))
+
+    def build_validation_row(self):
         self.log("Validate input ...")
         if self.validation_result_row_index is None:
             self.log("WARNING: validation row missing")
             return  # No validation row to write into
 
-        num_columns = len(self.doctors)
-        empty_row = ["validation_result"] + [""] * (num_columns - 1)
-        self.worksheet.update(
-            f"A{self.validation_result_row_index + 1}:{chr(65 + num_columns - 1)}{self.validation_result_row_index + 1}",
-            [empty_row]
-        )
-
         # Initialize empty warning list for each doctor (excluding Void)
         self.validation_row = ["validation_result"] + ["" for _ in self.doctors[:-1]]
 
@@ -292,167 +269,698 @@ class Processor :
         self.validate_minimum_active_doctors()
         self.validate_duplicate_doctor_names()
         self.validate_dates()
-        self.validate_min_feasibility()
+        self.validate_feasibility()
 
-        self.worksheet.update(
-            f"A{self.validation_result_row_index + 1}:{chr(65 + num_columns - 1)}{self.validation_result_row_index + 1}",
-            [self.validation_row]
-        )
+    def write_validation_row(self):
+        # the whole row is rewritten, so no separate clearing is needed
+        if self.validation_row is None:
+            return
+        self.plan_writes( lambda plan : plan.set_values(
+            self.worksheet, self.validation_result_row_index, 0, [self.validation_row]) )
+
+    def validate_input(self):
+        self.build_validation_row()
+        self.write_validation_row()
 
     def remove_disabled_doctors(self) :
-        disabled_doctors = [d for d in self.doctors if not self.enabled.get(d, True)]
-        for d in disabled_doctors:
-            self.doctors.remove(d)
-            self.min_shifts.pop(d, None)
-            self.preferred_shifts.pop(d, None)
-            self.preferred_shifts_weekday.pop(d, None)
-            self.preferred_shifts_weekend.pop(d, None)
-            self.max_shifts.pop(d, None)
-            self.prefer_dense.pop(d, None)
-            self.prefer_sparse.pop(d, None)
-            self.fixed_shifts = {
-                k: v for k, v in self.fixed_shifts.items() if k[0] != d
-            }
-            self.day_cost = {
-                k: v for k, v in self.day_cost.items() if k[0] != d
-            }      
+        # one mask over all rows instead of rebuilding dicts per doctor
+        self.instance = self.instance.subset( self.instance.enabled )
+
+    def build_warm_start( self ) :
+        # map the previous full schedule onto the current doctors / days
+        if not self.prior_schedule:
+            return None
+
+        prior_doctors = self.prior_schedule[0][1:]
+        prior_by_date = {}
+        for row in self.prior_schedule[1:]:
+            if not row or not row[0].strip():
+                continue
+            on_duty = [prior_doctors[j] for j, val in enumerate(row[1:len(prior_doctors) + 1])
+                       if val.strip().upper() == "YES"]
+            prior_by_date[row[0].strip()] = on_duty[0] if on_duty else None
+
+        inst = self.instance
+        assignment = []
+        reused = 0
+        for day, label in enumerate(self.date_labels):
+            forced = np.flatnonzero(inst.fixed[:, day] == MUST)
+            doctor = prior_by_date.get(label)
+            if len(forced):
+                doctor = self.doctors[forced[0]]  # new or changed "must" wins
+            elif doctor not in inst.doctor_index or inst.fixed[inst.doctor_index[doctor], day] == MUST_NOT:
+                doctor = None  # new date, removed doctor or new "must not"
+            else:
+                reused += 1
+            assignment.append(doctor)
+
+        # drop reused shifts within 2 days of a "must" of the same doctor (also a later one,
+        # which the pass below would only see after keeping the earlier shift)
+        for day, doctor in enumerate(assignment):
+            if doctor is None or doctor == "Void":
+                continue
+            i = inst.doctor_index[doctor]
+            if inst.fixed[i, day] != MUST and (inst.fixed[i, max(0, day - 2):day + 3] == MUST).any():
+                assignment[day] = None
+                reused -= 1
+
+        # drop non-fixed shifts that now break the 3-day rest window
+        last_day = {}
+        for day, doctor in enumerate(assignment):
+            if doctor is None or doctor == "Void":
+                continue
+            if day - last_day.get(doctor, -3) < 3 and inst.fixed[inst.doctor_index[doctor], day] != MUST:
+                assignment[day] = None
+                reused -= 1
+                continue
+            last_day[doctor] = day
+
+        if reused == 0:
+            return None
+
+        self.log(f"Warm start: reusing {reused} of {len(self.days)} days from the previous schedule")
+        return self.initial_matrix( assignment )
+
+    def initial_matrix( self, assignment ) :
+        # relabel interchangeable doctors to follow the symmetry-breaking order (by first shift)
+        for c in self.symmetry_classes:
+            first = {d: assignment.index(d) if d in assignment else len(assignment) for d in c}
+            relabel = dict(zip(sorted(c, key=lambda d: first[d]), c))
+            assignment = [relabel.get(d, d) for d in assignment]
+
+        # doctors x days 0/1 matrix
+        inst = self.instance
+        initial = np.zeros(inst.fixed.shape, dtype=np.int8)
+        for day, doctor in enumerate(assignment):
+            initial[inst.doctor_index[doctor if doctor is not None else "Void"], day] = 1
+        return initial
+
+    def detect_symmetry( self ) :
+        # doctors with identical parameters, costs and fixed cells are interchangeable
+        inst = self.instance
+        classes = {}
+        for i, d in enumerate(self.doctors):
+            if d == "Void":
+                continue
+            key = (inst.min_shifts[i], inst.max_shifts[i], inst.preferred_shifts[i],
+                   inst.preferred_shifts_weekday[i], inst.preferred_shifts_weekend[i],
+                   inst.prefer_dense[i], inst.prefer_sparse[i],
+                   inst.preference[i].tobytes(), inst.fixed[i].tobytes())
+            classes.setdefault(key, []).append(d)
+        self.symmetry_classes = [c for c in classes.values() if len(c) > 1]
+        if self.symmetry_classes:
+            self.log("Interchangeable doctors: " + "; ".join(", ".join(c) for c in self.symmetry_classes))
+
+    def symmetric_pairs( self ) :
+        return [(a, b) for c in self.symmetry_classes for a, b in zip(c, c[1:])]
+
+    def requested_solver( self ) :
+        # a one-solver list picks the solver of a single solve
+        return self.solvers[0] if self.solvers else "highs"
+
+    def create_model( self ) :
+        solver = self.requested_solver()
+        if self.backend == "highs" and solver == "highs":
+            return HighsSchedulerModel()
+        if self.backend == "highs":
+            self.log(f"Solver {solver} is only available through AMPL, using the AMPL backend for it")
+        return SchedulerModel(linearized=self.linearized, solver=solver)
+
+    def shared_model( self ) :
+        # the model from set_model(), if it is the one create_model() would build
+        model, solver = self.model, self.requested_solver()
+        if model is None or getattr(model, "solver", "highs") != solver:
+            return None
+        if isinstance(model, HighsSchedulerModel) != (self.backend == "highs" and solver == "highs"):
+            return None
+        if getattr(model, "linearized", False) != self.linearized:
+            return None
+        return model
+
+    def configure( self, settings ) :
+        # switches from the app sidebar / command line, see SETTINGS
+        for name, value in (settings or {}).items():
+            if name not in SETTINGS:
+                raise Exception(f"Unknown solver setting: {name}")
+            setattr( self, name, value )
+
+    def solver_settings( self ) :
+        # everything besides the instance and Params that can change the exported schedule
+        return {
+            "backend": self.backend,
+            "linearized": self.linearized,
+            "symmetry_breaking": self.symmetry_breaking,
+            "solvers": self.solvers,
+            "portfolio_deadline": self.portfolio_deadline,
+            "rolling_horizon": self.rolling_horizon,
+            "time_limit": self.time_limit,
+            "mip_gap": self.mip_gap,
+        }
 
     def solve_model( self ) :
-        model = SchedulerModel()
-
-        weekend_param = {day: val for day, val in zip(self.days, self.weekend)}
-
-        model.set_data(
-            doctors = self.doctors,
-            days = self.days,
-            day_cost = self.day_cost,
-            min_shifts = self.min_shifts,
-            max_shifts = self.max_shifts,
-            preferred_shifts = self.preferred_shifts,
-            preferred_shifts_weekday = self.preferred_shifts_weekday,
-            preferred_shifts_weekend = self.preferred_shifts_weekend,
-            prefer_dense = self.prefer_dense,
-            prefer_sparse = self.prefer_sparse,
-            fixed_shifts = self.fixed_shifts,
-            weekend_param = weekend_param )
-        
-        for d in self.doctors:
-            missing = [day for day in self.days if (d, day) not in self.day_cost]
-            if missing:
-                print(f"⚠️  {d} brakuje kosztu dla dni: {missing}")
+        self.cache_hit = False
+        self.build_seconds = None  # model data push, only measured for a single solve
+        self.pushed_values = None
+        if self.cache is not None:
+            self.solve_cached()
+        else:
+            self.solve_instance()
+
+        self.report.set( backend=self.backend, doctors=len(self.doctors) - 1, days=len(self.days),
+                         total_cost=self.total_cost, optimal=self.optimal, gap=self.gap, cache_hit=self.cache_hit,
+                         void_days=sum(doctor == "Void" for doctor in self.assignment), method=self.method )
+        alerts = self.report.alerts()
+        if alerts:
+            self.log("Run alerts: " + "; ".join(alerts))
+
+    def solve_cached( self ) :
+        key = self.cache.key( self.instance, self.solver_settings() )
+        entry = None if self.force_solve else self.cache.get( key )
+        if entry is not None:
+            self.cache_hit = True
+            self.assignment = entry["assignment"]
+            matrix = [[int(doctor == d) for d in self.doctors] for doctor in self.assignment]
+            self.schedule_matrix = pd.DataFrame(matrix, index=list(self.days), columns=list(self.doctors))
+            self.total_cost = entry["total_cost"]
+            self.optimal = entry["optimal"]
+            self.gap = entry["gap"]
+            self.method = entry.get("method", "mip")  # entries written before it was stored were MIP runs
+            self.solve_seconds = 0.0
+            self.log(f"♻️ Solution cache hit ({key[:12]}, solved {entry['created']} in {entry['solve_seconds']:.2f}s, "
+                     f"cost {self.total_cost}) – force a re-solve to recompute")
+            return
 
-        model.solve()
+        self.solve_instance()
+        if self.method == "heuristic":
+            return  # a solver run later should not be answered from the cache
+        self.cache.put( key, {
+            "assignment": list(self.assignment),
+            "total_cost": self.total_cost,
+            "optimal": self.optimal,
+            "gap": self.gap,
+            "method": self.method,
+            "solve_seconds": self.solve_seconds,
+        } )
+        self.log(f"Solution cached ({key[:12]})")
+
+    def solve_instance( self ) :
+        self.method = "mip"
+        self.heuristic_cost = None
+        if self.backend == "heuristic":
+            self.solve_heuristic()
+            return
 
-        print(model.get_schedule())
-        print("Total Cost:", model.get_total_cost())
-        print("Server log:", model.get_server_log())
-        self.schedule_df = model.get_schedule()
+        self.symmetry_classes = []
+        if self.symmetry_breaking:
+            self.detect_symmetry()
+        # blocks are solved cold: no warm start or heuristic start to build for them
+        if self.rolling_horizon and len(self.days) > self.rolling_horizon[0]:
+            self.solve_rolling()
+            return
 
-    def process_worksheet( self, spreadsheet, worksheet ) :
-        self.load_worksheet( spreadsheet, worksheet )
-        self.validate_input()
-        self.remove_disabled_doctors()
-        self.solve_model()
+        initial = self.build_warm_start() if self.warm_start else None
+        if initial is None and self.heuristic_start:
+            heuristic = self.run_heuristic()
+            if not heuristic["violations"]:
+                self.heuristic_cost = heuristic["objective"]
+                initial = self.initial_matrix( heuristic["assignment"] )
+                self.log(f"Warm start: heuristic schedule, cost {self.heuristic_cost:.2f}")
 
-    def export_schedule_to_full_sheet(self):
-        # new worksheet name
-        print("Doctors: {}".format(self.doctors))
-        new_sheet_name = f"{self.worksheet.title}-full-sched"
+        if self.solvers and len(self.solvers) > 1:
+            self.solve_portfolio( initial )
+            return
 
-        # if worksheet exists - remove it
         try:
-            existing = self.spreadsheet.worksheet(new_sheet_name)
-            self.spreadsheet.del_worksheet(existing)
-        except:
-            pass
-
-        # create adequately sized worksheet
-        num_rows = len(self.date_labels) + 1
-        num_cols = len(self.doctors) + 1
-        result_sheet = self.spreadsheet.add_worksheet(title=new_sheet_name, rows=str(num_rows), cols=str(num_cols))
-
-        header = ["Date"] + self.doctors
-        values = [header]
-
-        self.schedule_df = self.schedule_df.reset_index()
-        for i, date in enumerate(self.date_labels):
-            row = [date]
-            present = False
-            for doctor in self.doctors:
-                val = self.schedule_df.loc[
-                    (self.schedule_df["index0"] == doctor) & 
-                    (self.schedule_df["index1"] == i), "x.val"
-                ]
-                if not val.empty and val.values[0]==1 :
-                    present = True
-                row.append("YES" if not val.empty and val.values[0] == 1 else "")
-            values.append(row)
-            if not present :
-                print("Suspicious row for date {}:".format(date))
-                print(self.schedule_df[self.schedule_df["index1"] == i])
-
-        result_sheet.update(values)
-        self.format_weekends( result_sheet )
-        print(f"✅ Exported schedule to full sheet: {new_sheet_name}")
+            model = self.shared_model() or self.create_model()
+        except Exception as e:
+            if not self.heuristic_fallback:
+                raise
+            self.log(f"⚠️ The {self.requested_solver()} solver could not be started ({e}), using the heuristic schedule")
+            self.solve_heuristic()
+            return
+        model.set_limits(self.time_limit, self.mip_gap)
+        start = time.time()
+        with self.report.span("build"):
+            model.set_data(self.instance, self.symmetric_pairs())
+        self.build_seconds = time.time() - start
+        self.pushed_values = model.pushed_values
+        self.log(f"Model data: {model.pushed_values} value(s) pushed to the {self.backend} backend")
+
+        if initial is not None:
+            model.set_initial_schedule(initial)
+
+        start = time.time()
+        with self.report.span("solve"):
+            model.solve(progress=self.progress)
+        self.solve_seconds = time.time() - start
+        self.report.set_solver_log( model.get_server_log() )
+        self.log("Solved in {:.2f}s ({} objective)".format(
+            self.solve_seconds, "linearized" if model.linearized else "default"))
+        if initial is not None:
+            accepted = model.warm_start_accepted()
+            self.log("Warm start {}".format(
+                "accepted" if accepted else "rejected" if accepted is False else "passed (solver did not report)"))
+
+        status = model.get_solve_result()
+        if status not in ("solved", "limit"):
+            raise Exception(f"No feasible schedule found (solve_result: {status})")
+        # day -> doctor list and days x doctors matrix, extracted once for both exports
+        self.assignment, self.schedule_matrix = model.get_assignments(self.doctors, self.days)
+        if None in self.assignment:
+            raise Exception(f"No feasible schedule found (solve_result: {status})")
+        self.optimal = status == "solved"
+        self.gap = model.last_progress["gap"] if model.last_progress else None
+        if not self.optimal:
+            self.log(f"⚠️ Limit reached, exporting the best schedule found so far (gap: {self.gap}%)")
+
+        self.log(f"Assignments: {self.assignment}")
+        self.total_cost = model.get_total_cost()
+        self.log(f"Total Cost: {self.total_cost}")
+        if self.heuristic_cost is not None:
+            gap = (self.heuristic_cost - self.total_cost) / abs(self.total_cost) * 100 if self.total_cost else 0.0
+            self.report.set( heuristic_cost=self.heuristic_cost, heuristic_gap=round(gap, 3) )
+            self.log(f"Heuristic vs MIP: {self.heuristic_cost:.2f} vs {self.total_cost} ({gap:+.2f}%)")
+        self.log(f"Server log: {model.get_server_log()}")
+
+    def run_heuristic( self ) :
+        with self.report.span("heuristic"):
+            result = HeuristicSolver.solve(self.instance, time_limit=self.heuristic_seconds)
+        self.log("Heuristic: cost {:.2f} in {:.2f}s (greedy {:.2f} in {:.3f}s, {} moves)".format(
+            result["objective"], result["seconds"], result["construct_objective"],
+            result["construct_seconds"], result["moves"]))
+        for violation in result["violations"]:
+            self.log(f"⚠️ Heuristic: {violation}")
+        return result
+
+    def solve_heuristic( self ) :
+        # schedule without a MIP solver: good but not proven optimal
+        result = self.run_heuristic()
+        if result["violations"]:
+            raise Exception("No feasible schedule found by the heuristic: " + "; ".join(result["violations"]))
+        self.method = "heuristic"
+        self.assignment = result["assignment"]
+        self.schedule_matrix = pd.DataFrame(result["matrix"].T, index=list(self.days), columns=list(self.doctors))
+        self.total_cost = result["objective"]
+        self.optimal = False
+        self.gap = None
+        self.solve_seconds = result["seconds"]
+        self.log(f"Assignments: {self.assignment}")
+        self.log(f"Total Cost: {self.total_cost} (heuristic)")
+
+    def preview( self ) :
+        # heuristic schedule of the loaded worksheet, nothing is written
+        self.build_validation_row()
+        self.ensure_feasible()
+        self.remove_disabled_doctors()
+        self.solve_heuristic()
+        return self.schedule_matrix
 
-    def export_schedule_to_short_sheet(self):
-        new_sheet_name = f"{self.worksheet.title}-short-sched"
+    def score_schedule_sheet( self, spreadsheet, worksheet, kind="full" ) :
+        # cost and broken constraints of the exported, possibly hand-edited schedule;
+        # nothing is solved or written
+        self.load_worksheet( spreadsheet, worksheet )
+        self.remove_disabled_doctors()
+        title = f"{worksheet.title}-{kind}-sched"
+        matrix, problems = ScheduleScorer.read_schedule_sheet( self.instance, spreadsheet.worksheet(title).get_all_values() )
+        score = ScheduleScorer.ScheduleScorer( self.instance ).score( matrix )
+        score["problems"] = problems
+        score["assignment"] = [self.doctors[i] if matrix[:, day].sum() == 1 else None
+                               for day, i in enumerate(matrix.argmax(axis=0))]
+        self.log("{}: total cost {:.2f}, {} violation(s)".format(title, score["total_cost"], len(score["violations"])))
+        for line in problems + score["violations"]:
+            self.log(f"⚠️ {line}")
+        return score
+
+    def solve_portfolio( self, initial ) :
+        start = time.time()
+        with self.report.span("solve"):
+            winner, report = SolverPortfolio.solve_portfolio(
+                self.instance, symmetric_pairs=self.symmetric_pairs(), solvers=self.solvers, deadline=self.portfolio_deadline,
+                initial=initial, linearized=self.linearized, time_limit=self.time_limit, mip_gap=self.mip_gap,
+                backend=self.backend, log=self.log )
+        self.solve_seconds = time.time() - start
+        self.optimal = report["optimal"]
+        self.gap = winner["gap"] if winner is not None else None
+        SolverPortfolio.record_report( report )
+        if winner is None:
+            raise Exception("No solver in the portfolio found a schedule")
+        self.log("Portfolio winner: {} after {:.2f}s ({})".format(
+            winner["solver"], winner["seconds"], "optimal" if report["optimal"] else "best incumbent"))
+
+        self.report.set_solver_log( winner["log"] )
+        self.assignment, self.schedule_matrix = winner["assignment"], winner["matrix"]
+        self.total_cost = winner["objective"]
+        self.log(f"Assignments: {self.assignment}")
+        self.log(f"Total Cost: {self.total_cost}")
+
+    def block_data( self, start, end, committed, used ) :
+        # ProblemInstance for days [start, end), with budgets left after the committed days
+        # used: doctors x (total, weekday, weekend) shifts committed so far
+        T = len(self.days)
+        inst = self.instance
+        block = inst.slice_days(start, end)
+        final = end == T
+        weekend_in_block = int(self.weekend[start:end].sum())
+        weekend_left = int(self.weekend[start:].sum())
+        weekday_in_block = (end - start) - weekend_in_block
+        weekday_left = (T - start) - weekend_left
+
+        def share(preferred, done, in_block, left):
+            # remaining preference spread proportionally over the remaining days
+            remaining = np.maximum(0, preferred - done)
+            if not (final or left == 0):
+                remaining = np.round(remaining * in_block / left).astype(int)
+            return np.where(preferred < 0, preferred, remaining)
+
+        total, weekday, weekend = used.T
+        # whatever can't fit after this block has to be done inside it
+        later_capacity = 0 if final else self.later_capacity( end, np.maximum(0, inst.max_shifts - total) )
+        block.min_shifts = np.maximum(0, inst.min_shifts - total - later_capacity)
+        block.max_shifts = np.maximum(0, inst.max_shifts - total)
+        block.preferred_shifts = share(inst.preferred_shifts, total, end - start, T - start)
+        block.preferred_shifts_weekday = share(inst.preferred_shifts_weekday, weekday, weekday_in_block, weekday_left)
+        block.preferred_shifts_weekend = share(inst.preferred_shifts_weekend, weekend, weekend_in_block, weekend_left)
+
+        # rest period across the block edge
+        for day in range(max(0, start - 2), start):
+            doctor = committed[day]
+            if doctor is not None and doctor != "Void":
+                cells = block.fixed[inst.doctor_index[doctor], :max(0, day + 3 - start)]
+                cells[cells == FREE] = MUST_NOT
+        return block
+
+    def later_capacity( self, end, max_left ) :
+        # most shifts each doctor can still take in days [end, T): its allowed days that no
+        # other doctor must take, spaced by the rest period, capped by max_left
+        inst = self.instance
+        fixed = inst.fixed[:, end:]
+        num_days = fixed.shape[1]
+        taken = (fixed == MUST).any(axis=0)
+        capacity = np.zeros(len(self.doctors), dtype=int)
+        for i in range(len(self.doctors)):
+            forced = np.flatnonzero(fixed[i] == MUST)
+            available = np.flatnonzero((fixed[i] != MUST_NOT) & ~taken)
+            capacity[i] = FeasibilityCheck.max_spaced_shifts(set(available.tolist()), forced.tolist(), num_days)
+        return np.minimum(capacity, max_left)
+
+    def solve_data( self, instance, symmetric_pairs=() ) :
+        # solve one instance, return (solve_result, assignment, objective)
+        model = self.shared_model() or self.create_model()
+        model.set_limits(self.time_limit, self.mip_gap)
+        model.set_data(instance, symmetric_pairs)
+        model.solve()
+        status = model.get_solve_result()
+        if status not in ("solved", "limit"):
+            return status, [None] * len(instance.days), None
+        assignment, _ = model.get_assignments(instance.doctors, instance.days)
+        objective = model.get_total_cost() if None not in assignment else None
+        return status, assignment, objective
+
+    def solve_rolling( self ) :
+        block_days, overlap_days = self.rolling_horizon
+        if overlap_days >= block_days:
+            raise Exception("Rolling horizon overlap must be shorter than the block")
+        T = len(self.days)
+        committed = [None] * T
+        used = np.zeros((len(self.doctors), 3), dtype=int)  # total, weekday, weekend
+        optimal = True
+
+        solve_start = time.time()
+        start = 0
+        while start < T:
+            end = min(T, start + block_days)
+            commit_end = end if end == T else end - overlap_days
+            with self.report.span(f"solve days {start + 1}-{end}"):
+                status, assignment, _ = self.solve_data( self.block_data(start, end, committed, used) )
+            if status not in ("solved", "limit") or None in assignment:
+                raise Exception(f"No feasible schedule for days {start + 1}-{end} (solve_result: {status})")
+            optimal = optimal and status == "solved"
+            self.log(f"Rolling horizon: days {start + 1}-{end} solved ({status}), keeping {start + 1}-{commit_end}")
+
+            for day in range(start, commit_end):
+                doctor = assignment[day - start]
+                committed[day] = doctor
+                i = self.instance.doctor_index[doctor]
+                used[i, 0] += 1
+                used[i, 2 if self.weekend[day] else 1] += 1
+            start = commit_end
+        self.solve_seconds = time.time() - solve_start
+        # every block may be optimal, the stitched schedule is still not proven optimal
+        self.optimal = False
+        self.gap = None
+        self.report.set( rolling_blocks_optimal=optimal )
+
+        # cost of the stitched schedule under the full-horizon model: fix every shift and re-solve
+        # (without symmetry pairs: the stitched schedule needn't follow the symmetry order)
+        stitched = self.instance.copy()
+        stitched.fixed[[self.instance.doctor_index[doctor] for doctor in committed], self.days] = MUST
+        with self.report.span("stitched cost"):
+            status, _, self.total_cost = self.solve_data( stitched )
+        if self.total_cost is None:
+            raise Exception(f"Stitched schedule violates the full-horizon constraints (solve_result: {status})")
+
+        self.assignment = committed
+        matrix = [[int(doctor == d) for d in self.doctors] for doctor in committed]
+        self.schedule_matrix = pd.DataFrame(matrix, index=list(self.days), columns=list(self.doctors))
+        self.log("Rolling horizon: {:.2f}s, total cost {}".format(self.solve_seconds, self.total_cost))
+
+        if self.compare_monolithic:
+            start = time.time()
+            status, _, monolithic = self.solve_data( self.instance, self.symmetric_pairs() )
+            if monolithic is not None:
+                gap = (self.total_cost - monolithic) / abs(monolithic) * 100 if monolithic else 0.0
+                self.log("Rolling horizon vs monolithic: {} vs {} ({:+.2f}%), monolithic solve {:.2f}s ({})".format(
+                    self.total_cost, monolithic, gap, time.time() - start, status))
+            else:
+                self.log(f"Monolithic solve gave no schedule (solve_result: {status})")
+
+    def date_header( self ) :
+        # first header cell of both exports; flags schedules cut off by a limit
+        if self.method == "heuristic":
+            return "Date ⚠️ HEURISTIC (not optimized by a solver)"
+        if self.optimal:
+            return "Date"
+        if self.rolling_horizon and len(self.days) > self.rolling_horizon[0]:
+            return "Date ⚠️ NOT OPTIMAL (solved in rolling-horizon blocks)"
+        gap = f", gap {self.gap:.2f}%" if self.gap is not None else ""
+        return f"Date ⚠️ NOT OPTIMAL (limit reached{gap})"
 
-        try:
-            existing = self.spreadsheet.worksheet(new_sheet_name)
-            self.spreadsheet.del_worksheet(existing)
-        except:
-            pass
+    def process_worksheet( self, spreadsheet, worksheet ) :
+        # phase can be polled from another thread while this runs
+        with self.span("loading"):
+            self.load_worksheet( spreadsheet, worksheet )
+        with self.span("validating"):
+            self.validate_input()
+            self.ensure_feasible()
+            self.remove_disabled_doctors()
+        with self.span("solving"):
+            self.solve_model()
+
+    def span( self, phase ) :
+        # sets the polled phase and times it in the run report
+        self.phase = phase
+        return self.report.span( phase )
+
+    def begin_writes( self, spreadsheet ) :
+        # collect the validation row and both exports into one batch, sent by commit_writes()
+        self.write_plan = WritePlan( spreadsheet )
+
+    def commit_writes( self ) :
+        plan, self.write_plan = self.write_plan, None
+        if plan is None:
+            return
+        changed_rows = plan.changed_rows
+        with self.report.span("writing"):
+            requests = plan.commit()
+            flush_spreadsheet( plan.spreadsheet )
+        self.log(f"Sheets: {changed_rows} changed row(s) written with {requests} request(s) in one batch")
+
+    def plan_writes( self, record ) :
+        # record(plan) adds writes to the run's plan, or to a batch of its own outside begin_writes()
+        if self.write_plan is not None:
+            record( self.write_plan )
+            return
+        plan = WritePlan( self.spreadsheet )
+        record( plan )
+        plan.commit()
+        flush_spreadsheet( self.spreadsheet )
 
-        # Zakładamy, że schedule_df ma MultiIndex (doctor, day)
-        self.schedule_df = self.schedule_df.reset_index()
+    def export_schedule_to_full_sheet(self):
+        with self.report.span("export full"):
+            # new worksheet name
+            self.log("Doctors: {}".format(self.doctors))
+            new_sheet_name = f"{self.worksheet.title}-full-sched"
 
-        values = [["Date", "On-call"]]
+            header = [self.date_header()] + self.doctors
+            values = [header]
 
-        for i, date in enumerate(self.date_labels):
-            # Filtrujemy rząd z x.val == 1 dla danego dnia
-            row = self.schedule_df[(self.schedule_df["index1"] == i) & (self.schedule_df["x.val"] == 1)]
+            for date, marks, doctor in zip(self.date_labels, self.schedule_matrix.values, self.assignment):
+                values.append([date] + ["YES" if mark else "" for mark in marks])
+                if doctor is None :
+                    self.log("Suspicious row for date {}: nobody on duty".format(date))
 
-            # Sprawdź czy ktoś miał dyżur (teoretycznie zawsze powinien ktoś być)
-            doctor = row["index0"].values[0] if not row.empty else "???"
-            values.append([date, doctor])
+            # created, or only its changed rows rewritten when it already exists
+            self.plan_writes( lambda plan : plan.write_sheet( new_sheet_name, values, self.weekend_colors() ) )
+            self.log(f"✅ Exported schedule to full sheet: {new_sheet_name}")
 
-        result_sheet = self.spreadsheet.add_worksheet(title=new_sheet_name, rows=str(len(values)), cols="2")
-        result_sheet.update(values)
-        self.format_weekends( result_sheet )
+    def export_schedule_to_short_sheet(self):
+        with self.report.span("export short"):
+            new_sheet_name = f"{self.worksheet.title}-short-sched"
 
-        print(f"✅ Exported short schedule to short sheet: {new_sheet_name}")
-    
-    def format_weekends( self, result_sheet ) :
+            values = [[self.date_header(), "On-call"]]
 
-        # Komórki z datami zaczynają się od drugiego wiersza (bo pierwszy to nagłówek)
-        red_text = CellFormat(textFormat=TextFormat(foregroundColor={"red": 1, "green": 0, "blue": 0}))
+            for date, doctor in zip(self.date_labels, self.assignment):
+                # teoretycznie zawsze ktoś powinien mieć dyżur
+                values.append([date, doctor if doctor is not None else "???"])
 
-        # Zakładamy, że lista weekend ma tyle samo elementów co date_labels
-        ranges_to_format = []
-        for i, is_weekend in enumerate(self.weekend):
-            if is_weekend:
-                # Wiersze w Sheets zaczynają się od 1, więc +2 (bo nagłówek i 0-indeks)
-                row = i + 2
-                ranges_to_format.append((f"A{row}", red_text))
+            self.plan_writes( lambda plan : plan.write_sheet( new_sheet_name, values, self.weekend_colors() ) )
+            self.log(f"✅ Exported short schedule to short sheet: {new_sheet_name}")
 
-        format_cell_ranges(result_sheet, ranges_to_format)
+    def weekend_colors( self ) :
+        # Komórki z datami zaczynają się od drugiego wiersza (bo pierwszy to nagłówek)
+        # (row, col) zero-based -> red text
+        return {(i + 1, 0): RED for i, is_weekend in enumerate(self.weekend) if is_weekend}
 
-def process_spreadsheets( client, logging ) :
+def process_spreadsheets( client, logging, cache=None, force_solve=False, settings=None ) :
     # sheet = client.open("Graf Lekarzy").worksheet("Dane")  # Arkusz musi istnieć
-    print("Spreadsheets:")
+    # returns the run report of every worksheet
+    reports = []
+    logging("Spreadsheets:")
     for ss in client.openall():
-        print(f"    {ss.title} – {ss.id}")
+        logging(f"    {ss.title} – {ss.id}")
         for worksheet in ss.worksheets():
             if worksheet.title.endswith("-sched") : continue
-            print(f"        🗂️ Processing sheet: {worksheet.title}")
+            logging(f"        🗂️ Processing sheet: {worksheet.title}")
             processor = Processor()
             processor.set_logging( logging )
-            processor.process_worksheet( ss, worksheet )
-            processor.export_schedule_to_full_sheet()
-            processor.export_schedule_to_short_sheet()
+            processor.cache = cache
+            processor.force_solve = force_solve
+            processor.configure( settings )
+            processor.begin_writes( ss )
+            try:
+                processor.process_worksheet( ss, worksheet )
+                processor.export_schedule_to_full_sheet()
+                processor.export_schedule_to_short_sheet()
+            finally:
+                processor.commit_writes()
+                reports.append( processor.report.to_dict() )
+    return reports
+
+def solve_worksheet_data( title, data, prior_schedule=None, cache=None, force_solve=False, settings=None ) :
+    # runs in a worker process: no Sheets I/O, only parsing, validation and the solve
+    lines = []
+    processor = Processor()
+    processor.set_logging( lines.append )
+    processor.cache = cache
+    processor.force_solve = force_solve
+    processor.configure( settings )
+    error = None
+    try:
+        processor.report.set( worksheet=title )
+        with processor.span("loading"):
+            processor.load_data( data )
+            processor.prior_schedule = prior_schedule
+        with processor.span("validating"):
+            processor.build_validation_row()
+            processor.ensure_feasible()
+            processor.remove_disabled_doctors()
+        with processor.span("solving"):
+            processor.solve_model()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    processor.log = None  # lambdas don't pickle
+    return processor, lines, error
+
+def process_spreadsheets_batch( client, logging, max_workers=None, cache=None, force_solve=False, settings=None ) :
+    summary = []
+
+    # 1. fetch all worksheet data up front
+    jobs = []
+    for ss in client.openall():
+        for worksheet in ss.worksheets():
+            if worksheet.title.endswith("-sched") : continue
+            try:
+                jobs.append((ss, worksheet, worksheet.get_all_values(), read_prior_schedule( ss, worksheet.title )))
+            except Exception as e:
+                summary.append({"spreadsheet": ss.title, "worksheet": worksheet.title,
+                                "status": "failed", "error": f"fetch: {e}"})
+    logging(f"Fetched {len(jobs)} worksheet(s)")
+
+    # 2. solve concurrently, each worker process builds its own SchedulerModel / AMPL
+    solved = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(solve_worksheet_data, ws.title, data, prior, cache, force_solve, settings): (ss, ws) for ss, ws, data, prior in jobs}
+        for future in as_completed(futures):
+            ss, ws = futures[future]
+            try:
+                processor, lines, error = future.result()
+            except Exception as e:
+                processor, lines, error = None, [], f"worker: {e}"
+            for line in lines:
+                logging(f"[{ss.title} / {ws.title}] {line}")
+            solved.append((ss, ws, processor, error))
+
+    # 3. write results back in one phase
+    for ss, ws, processor, error in solved:
+        entry = {"spreadsheet": ss.title, "worksheet": ws.title, "status": "ok", "error": None}
+        try:
+            if processor is not None:
+                processor.set_logging( logging )
+                processor.spreadsheet = ss
+                processor.worksheet = ws
+                processor.report.set( spreadsheet=ss.title )
+                processor.begin_writes( ss )
+                processor.write_validation_row()
+            if error is None:
+                processor.export_schedule_to_full_sheet()
+                processor.export_schedule_to_short_sheet()
+                entry["total_cost"] = processor.total_cost
+                entry["solve_seconds"] = round(processor.solve_seconds, 2)
+            if processor is not None:
+                processor.commit_writes()
+                entry["report"] = processor.report.to_dict()
+        except Exception as e:
+            error = f"export: {e}"
+        if error is not None:
+            entry["status"] = "failed"
+            entry["error"] = error
+        summary.append(entry)
+
+    logging("Batch summary:")
+    for entry in summary:
+        details = entry["error"] if entry["status"] != "ok" else \
+            f"cost={entry['total_cost']}, solve={entry['solve_seconds']}s"
+        logging(f"    {entry['status']:6} {entry['spreadsheet']} / {entry['worksheet']}: {details}")
+    return summary
 
 if __name__ == "__main__":
-    print("Alive")
-    # process_spreadsheets()
-
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", help="directory with *.xlsx files / CSV directories")
+    parser.add_argument("--workers", type=int, default=None, help="solve worksheets in parallel on N processes")
+    parser.add_argument("--cache", default=None, help="directory of the solution cache (off by default)")
+    parser.add_argument("--force", action="store_true", help="re-solve even if the cache has the schedule")
+    parser.add_argument("--report", default=None, help="append the JSON run report of every worksheet to this file")
+    parser.add_argument("--backend", default="ampl", choices=["ampl", "highs", "heuristic"],
+                        help='"ampl", "highs" (in-process highspy, no AMPL) or "heuristic" (no MIP)')
+    add_settings_arguments( parser )
+    args = parser.parse_args()
+    settings = settings_from_arguments( args )
+    if args.directory:
+        from LocalStorage import LocalClient
+        client = LocalClient(args.directory)
+        cache = SolutionCache(args.cache) if args.cache else None
+        if args.workers:
+            summary = process_spreadsheets_batch( client, print, max_workers=args.workers, cache=cache, force_solve=args.force,
+                                                  settings=settings )
+            reports = [entry["report"] for entry in summary if "report" in entry]
+        else:
+            reports = process_spreadsheets( client, print, cache=cache, force_solve=args.force, settings=settings )
+        if args.report:
+            # one JSON object per line, for log shipping / alerting
+            with open(args.report, "a", encoding="utf-8") as f:
+                for report in reports:
+                    f.write(json.dumps(report, default=str) + "\n")
+    else:
+        print("Alive")
+        # process_spreadsheets()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# Structured report of one worksheet run: timed (nested) spans for every phase, the
+# statistics parsed from the solver log and a few outcome fields. Serializes to JSON
+# for logs / alerting and to a compact table for the UI.
+import json
+import re
+import time
+from contextlib import contextmanager
+
+SLOW_SOLVE_SECONDS = 60  # solves above this are flagged in alerts()
+
+# HiGHS log (highspy, or the AMPL driver with outlev=1)
+HIGHS_PATTERNS = {
+    "model": re.compile(r"^(?:MIP|LP)\s+(?:\S+\s+)?has (\d+) rows; (\d+) cols; (\d+) nonzeros(?:; (\d+) integer)?", re.M),
+    "presolve": re.compile(r"^Presolve reductions: rows (\d+)\((-?\d+)\); columns (\d+)\((-?\d+)\); "
+                           r"(?:nonzeros|elements) (\d+)\((-?\d+)\)", re.M),
+    "status": re.compile(r"^\s*Status\s+(.+?)\s*$", re.M),
+    "primal_bound": re.compile(r"^\s*Primal bound\s+(\S+)", re.M),
+    "dual_bound": re.compile(r"^\s*Dual bound\s+(\S+)", re.M),
+    "gap": re.compile(r"^\s*Gap\s+(\S+?)%", re.M),
+    "nodes": re.compile(r"^\s*Nodes\s+(\d+)", re.M),
+    "lp_iterations": re.compile(r"^\s*LP iterations\s+(\d+)", re.M),
+    "timing": re.compile(r"^\s*Timing\s+([\d.]+)", re.M),
+    "presolve_seconds": re.compile(r"^\s*([\d.]+) \(Presolve\)", re.M),
+}
+
+# AMPL (show_stats / presolve messages and the solver driver's result line)
+AMPL_PATTERNS = {
+    "eliminated": re.compile(r"Presolve eliminates (\d+) constraints? and (\d+) variables?"),
+    "variables": re.compile(r"^(\d+) variables", re.M),
+    "constraints": re.compile(r"^(\d+) constraints?[^;\n]*;\s*(\d+) nonzeros", re.M),
+    "result": re.compile(r"^HiGHS [\d.]+: (.+?); objective (\S+)", re.M),
+    "branching_nodes": re.compile(r"^(\d+) branching nodes", re.M),
+    "simplex_iterations": re.compile(r"^(\d+) simplex iterations", re.M),
+}
+
+
+def to_number(token):
+    try:
+        value = float(token)
+    except (TypeError, ValueError):
+        return None  # "inf", "Large", ...
+    return int(value) if value.is_integer() and "." not in token else value
+
+
+def parse_solver_log(log):
+    # whatever of rows / cols / nonzeros, presolve reductions, nodes, gap, bounds and
+    # solve time the log reports; missing values are left out
+    stats = {}
+    if not log:
+        return stats
+
+    match = HIGHS_PATTERNS["model"].search(log)
+    if match:
+        stats.update(rows=int(match[1]), cols=int(match[2]), nonzeros=int(match[3]))
+        if match[4] is not None:
+            stats["integer_cols"] = int(match[4])
+    match = HIGHS_PATTERNS["presolve"].search(log)
+    if match:
+        stats["presolved"] = {"rows": int(match[1]), "cols": int(match[3]), "nonzeros": int(match[5])}
+        stats["presolve_removed"] = {"rows": -int(match[2]), "cols": -int(match[4]), "nonzeros": -int(match[6])}
+    for name in ("status", "primal_bound", "dual_bound", "gap", "nodes", "lp_iterations"):
+        match = HIGHS_PATTERNS[name].search(log)
+        if match:
+            stats[name] = match[1] if name == "status" else to_number(match[1])
+    match = HIGHS_PATTERNS["timing"].search(log)
+    if match:
+        stats["solve_seconds"] = float(match[1])
+    match = HIGHS_PATTERNS["presolve_seconds"].search(log)
+    if match:
+        stats["presolve_seconds"] = float(match[1])
+
+    match = AMPL_PATTERNS["eliminated"].search(log)
+    if match:
+        stats.setdefault("presolve_removed", {}).update(rows=int(match[1]), cols=int(match[2]))
+    match = AMPL_PATTERNS["variables"].search(log)
+    if match:
+        stats.setdefault("cols", int(match[1]))
+    match = AMPL_PATTERNS["constraints"].search(log)
+    if match:
+        stats.setdefault("rows", int(match[1]))
+        stats.setdefault("nonzeros", int(match[2]))
+    match = AMPL_PATTERNS["result"].search(log)
+    if match:
+        stats.setdefault("status", match[1])
+        stats.setdefault("primal_bound", to_number(match[2]))
+    match = AMPL_PATTERNS["branching_nodes"].search(log)
+    if match:
+        stats.setdefault("nodes", int(match[1]))
+    match = AMPL_PATTERNS["simplex_iterations"].search(log)
+    if match:
+        stats.setdefault("lp_iterations", int(match[1]))
+    return stats
+
+
+class RunReport :
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.origin = clock()
+        self.spans = []  # {"name", "depth", "start", "seconds", "failed"}, in start order
+        self.depth = 0
+        self.info = {}  # spreadsheet, worksheet, backend, doctors, days, total_cost, ...
+        self.solver = {}  # parse_solver_log() of the last solve
+
+    @contextmanager
+    def span(self, name):
+        span = {"name": name, "depth": self.depth, "start": self.clock() - self.origin,
+                "seconds": None, "failed": False}
+        self.spans.append(span)
+        self.depth += 1
+        try:
+            yield span
+        except BaseException:
+            span["failed"] = True
+            raise
+        finally:
+            self.depth -= 1
+            span["seconds"] = self.clock() - self.origin - span["start"]
+
+    def set(self, **info):
+        self.info.update(info)
+
+    def set_solver_log(self, log):
+        self.solver = parse_solver_log(log)
+
+    def seconds(self, name):
+        # total time of all spans called name
+        return sum(span["seconds"] or 0.0 for span in self.spans if span["name"] == name)
+
+    def alerts(self, slow_solve_seconds=SLOW_SOLVE_SECONDS):
+        alerts = []
+        solve = self.seconds("solve")
+        if solve > slow_solve_seconds:
+            alerts.append(f"slow solve: {solve:.1f}s (threshold {slow_solve_seconds}s)")
+        if self.info.get("method") == "heuristic":
+            alerts.append("heuristic schedule, no solver was used")
+        elif self.info.get("optimal") is False:
+            gap = self.info.get("gap")
+            alerts.append("not optimal" + (f", gap {gap:.2f}%" if gap is not None else ""))
+        if self.info.get("void_days"):
+            alerts.append(f"{self.info['void_days']} day(s) left to Void")
+        alerts += [f"{span['name']} failed" for span in self.spans if span["failed"]]
+        return alerts
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "info": self.info,
+            "spans": [dict(span, start=round(span["start"], 4),
+                           seconds=None if span["seconds"] is None else round(span["seconds"], 4))
+                      for span in self.spans],
+            "solver": self.solver,
+            "alerts": self.alerts(),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), default=str, **kwargs)
+
+    def table(self):
+        # rows for a compact UI table: one per span, nested spans indented
+        total = sum(span["seconds"] or 0.0 for span in self.spans if span["depth"] == 0) or 1.0
+        return [{"phase": "  " * span["depth"] + span["name"],
+                 "seconds": round(span["seconds"] or 0.0, 3),
+                 "share": f"{(span['seconds'] or 0.0) / total:.0%}" if span["depth"] == 0 else "",
+                 "status": "failed" if span["failed"] else ""}
+                for span in self.spans]
+
+    def solver_table(self):
+        # flat (statistic, value) rows of the parsed solver log
+        rows = []
+        for name, value in self.solver.items():
+            if isinstance(value, dict):
+                value = ", ".join(f"{key} {val}" for key, val in value.items())
+            rows.append({"statistic": name.replace("_", " "), "value": str(value)})
+        return rows
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# Cost and constraint check of any schedule without a solver: every Total_Cost term of
+# SchedulerModel and the violations of its constraints, computed with NumPy over whole
+# doctors x days 0/1 matrices. score_batch() takes a stack of them (rosters x doctors x
+# days) in one go, for comparison and search tools; read_schedule_sheet() turns a
+# hand-edited -full-sched / -short-sched worksheet back into a matrix:
+#
+#   python3 ScheduleScorer.py rosters/Ward.xlsx --worksheet Roster
+import numpy as np
+
+import Params
+from ProblemInstance import MUST, MUST_NOT
+
+REST_DAYS = 3  # Min_Rest_Period over REST_WINDOW_STARTS = 0 .. T - 3
+WINDOW = 5  # dense / sparse windows over WINDOW_STARTS = 0 .. T - 5
+
+CONSTRAINTS = ["One_Doctor_Per_Day", "Min_Shifts", "Max_Shifts", "Min_Rest_Period",
+               "Fixed_Shifts_Zero", "Fixed_Shifts_One"]
+
+# cells of a full schedule that mean "on duty"
+ON_DUTY = {"YES", "TAK", "X", "1"}
+
+
+def window_sums(x, width):
+    # shifts in every width-day window of the last axis, windows starting at 0 .. T - width
+    csum = np.zeros(x.shape[:-1] + (x.shape[-1] + 1,), dtype=np.int32)
+    np.cumsum(x, axis=-1, out=csum[..., 1:])
+    return csum[..., width:] - csum[..., :-width] if x.shape[-1] >= width else csum[..., :0]
+
+
+def assignment_matrix(instance, assignment):
+    # day -> doctor list (None: nobody) -> doctors x days 0/1 matrix
+    x = np.zeros((len(instance.doctors), instance.num_days), dtype=np.int8)
+    for day, doctor in enumerate(assignment):
+        if doctor is not None:
+            x[instance.doctor_index[doctor], day] = 1
+    return x
+
+
+def read_schedule_sheet(instance, values):
+    # -full-sched (date x doctor "YES" cells) or -short-sched (date, doctor) values ->
+    # (matrix, problems); rows are matched to the roster by date label
+    x = np.zeros((len(instance.doctors), instance.num_days), dtype=np.int8)
+    problems = []
+    if not values:
+        return x, ["empty schedule sheet"]
+    day_of = {label.strip(): day for day, label in enumerate(instance.date_labels)}
+    short = len(values[0]) >= 2 and values[0][1].strip() == "On-call"
+    columns = [name.strip() for name in values[0][1:]]
+    for name in columns if not short else []:
+        if name and name not in instance.doctor_index:
+            problems.append(f"unknown doctor column: {name}")
+
+    seen = set()
+    for row in values[1:]:
+        if not row or not row[0].strip():
+            continue
+        label = row[0].strip()
+        day = day_of.get(label)
+        if day is None:
+            problems.append(f"date {label} is not in the roster")
+            continue
+        seen.add(day)
+        if short:
+            names = [row[1].strip()] if len(row) > 1 and row[1].strip() not in ("", "???") else []
+        else:
+            names = [name for name, cell in zip(columns, row[1:]) if cell.strip().upper() in ON_DUTY]
+        for name in names:
+            if name in instance.doctor_index:
+                x[instance.doctor_index[name], day] = 1
+            elif short:
+                problems.append(f"date {label}: unknown doctor {name}")
+    for day in sorted(set(range(instance.num_days)) - seen):
+        problems.append(f"date {instance.date_labels[day]} is missing from the schedule")
+    return x, problems
+
+
+class ScheduleScorer :
+
+    def __init__(self, instance):
+        # weights are read from Params here, build a new scorer after changing them
+        self.instance = instance
+        self.regular = instance.regular
+        self.weekend = instance.weekend
+        self.day_cost = instance.day_cost
+        self.must = instance.fixed == MUST
+        self.must_not = instance.fixed == MUST_NOT
+        self.targets = {
+            "preferred": instance.preferred_shifts,
+            "weekday": instance.preferred_shifts_weekday,
+            "weekend": instance.preferred_shifts_weekend,
+        }
+
+    def terms(self, x):
+        # counts behind every Total_Cost term; x is doctors x days or rosters x doctors x days
+        x = np.asarray(x, dtype=np.int8)
+        inst = self.instance
+        total = x.sum(axis=-1)
+        weekend_count = x[..., self.weekend].sum(axis=-1)
+        weekday_count = total - weekend_count
+
+        def deviation(target, count):
+            return np.where(target >= 0, np.abs(count - target), 0).sum(axis=-1)
+
+        wanted = self.targets["weekend"]
+        windows = window_sums(x, WINDOW) >= 2
+        assigned = x.astype(bool) & self.regular[:, None]
+        return {
+            "day_cost": (x * self.day_cost).sum(axis=(-2, -1)),
+            "void_days": x[..., ~self.regular, :].sum(axis=(-2, -1)),
+            "willing_days": (assigned & (inst.preference > 0)).sum(axis=(-2, -1)),
+            "reluctant_days": (assigned & (inst.preference < 0)).sum(axis=(-2, -1)),
+            "preferred_deviation": deviation(self.targets["preferred"], total),
+            "weekday_deviation": deviation(self.targets["weekday"], weekday_count),
+            "weekend_missing": np.where(wanted >= 0, np.maximum(0, wanted - weekend_count), 0).sum(axis=-1),
+            "weekend_excess": np.where(wanted >= 0, np.maximum(0, weekend_count - wanted), 0).sum(axis=-1),
+            "dense_windows": windows[..., inst.prefer_dense, :].sum(axis=(-2, -1)),
+            "sparse_windows": windows[..., inst.prefer_sparse, :].sum(axis=(-2, -1)),
+        }
+
+    def costs(self, terms):
+        return {
+            "day_cost": terms["day_cost"],
+            "preferred": Params.PENALTY_NOT_PREFERRED_SHIFTS * (terms["preferred_deviation"] + terms["weekday_deviation"]),
+            "weekend": Params.PENALTY_MISSING_WEEKEND_SHIFT * terms["weekend_missing"]
+                       + Params.PENALTY_EXCESS_WEEKEND_SHIFT * terms["weekend_excess"],
+            "frequency": Params.PENALTY_WRONG_FREQUENCY * (terms["sparse_windows"] - terms["dense_windows"]),
+        }
+
+    def violation_counts(self, x):
+        # broken rows of every constraint, per roster for a stack
+        x = np.asarray(x, dtype=np.int8)
+        inst = self.instance
+        total = x.sum(axis=-1)
+        regular = self.regular
+        return {
+            "One_Doctor_Per_Day": (x.sum(axis=-2) != 1).sum(axis=-1),
+            "Min_Shifts": ((total < inst.min_shifts) & regular).sum(axis=-1),
+            "Max_Shifts": ((total > inst.max_shifts) & regular).sum(axis=-1),
+            "Min_Rest_Period": (window_sums(x[..., regular, :], REST_DAYS) > 1).sum(axis=(-2, -1)),
+            "Fixed_Shifts_Zero": (x.astype(bool) & self.must_not).sum(axis=(-2, -1)),
+            "Fixed_Shifts_One": (~x.astype(bool) & self.must).sum(axis=(-2, -1)),
+        }
+
+    def score(self, x):
+        # one doctors x days matrix -> total cost, cost per term, counts and violations
+        terms = {name: value.item() for name, value in self.terms(x).items()}
+        costs = {name: float(value) for name, value in self.costs(terms).items()}
+        return {
+            "total_cost": sum(costs.values()),
+            "costs": costs,
+            "counts": terms,
+            "shifts": {d: int(n) for d, n, regular in zip(self.instance.doctors, np.asarray(x).sum(axis=1), self.regular)
+                       if regular},
+            "violations": self.violations(x),
+        }
+
+    def score_batch(self, X):
+        # rosters x doctors x days -> (total cost per roster, violated rows per roster)
+        X = np.asarray(X, dtype=np.int8)
+        totals = sum(self.costs(self.terms(X)).values()).astype(float)
+        violations = sum(self.violation_counts(X).values())
+        return totals, violations
+
+    def violations(self, x):
+        # readable list of everything SchedulerModel would not accept
+        x = np.asarray(x, dtype=np.int8)
+        inst = self.instance
+        labels = inst.date_labels
+        found = []
+        for day in np.flatnonzero(x.sum(axis=0) != 1):
+            found.append(f"One_Doctor_Per_Day: {labels[day]} has {x[:, day].sum()} doctor(s) on duty")
+        total = x.sum(axis=1)
+        rest = window_sums(x, REST_DAYS)
+        for i, doctor in enumerate(inst.doctors):
+            if not self.regular[i]:
+                continue
+            if total[i] < inst.min_shifts[i]:
+                found.append(f"Min_Shifts: {doctor} has {total[i]} shift(s), minimum {inst.min_shifts[i]}")
+            if total[i] > inst.max_shifts[i]:
+                found.append(f"Max_Shifts: {doctor} has {total[i]} shift(s), maximum {inst.max_shifts[i]}")
+            for day in np.flatnonzero(rest[i] > 1):
+                found.append(f"Min_Rest_Period: {doctor} has {rest[i, day]} shifts in "
+                             f"{labels[day]} .. {labels[day + REST_DAYS - 1]}")
+        for i, day in zip(*np.nonzero(x.astype(bool) & self.must_not)):
+            found.append(f"Fixed_Shifts_Zero: {inst.doctors[i]} is on duty on {labels[day]} (\"must not\")")
+        for i, day in zip(*np.nonzero(~x.astype(bool) & self.must)):
+            found.append(f"Fixed_Shifts_One: {inst.doctors[i]} is not on duty on {labels[day]} (\"must\")")
+        return found
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+    from LocalStorage import CsvSpreadsheet, XlsxSpreadsheet
+    import Processor
+    parser = argparse.ArgumentParser()
+    parser.add_argument("spreadsheet", help=".xlsx file or directory of .csv files")
+    parser.add_argument("--worksheet", required=True, help="the roster worksheet; its -full-sched sheet is scored")
+    parser.add_argument("--short", action="store_true", help="score the -short-sched sheet instead")
+    parser.add_argument("--json", action="store_true", help="print the whole score as JSON")
+    args = parser.parse_args()
+
+    spreadsheet = CsvSpreadsheet(args.spreadsheet) if os.path.isdir(args.spreadsheet) else XlsxSpreadsheet(args.spreadsheet)
+    processor = Processor.Processor()
+    processor.set_logging( lambda line : None )
+    score = processor.score_schedule_sheet( spreadsheet, spreadsheet.worksheet(args.worksheet),
+                                            "short" if args.short else "full" )
+    if args.json:
+        print(json.dumps(score, indent=1, default=str))
+    else:
+        print(f"Total cost: {score['total_cost']:.2f}")
+        for name, value in score["costs"].items():
+            print(f"  {name:>10}: {value:.2f}")
+        for line in score["problems"] + score["violations"]:
+            print(f"⚠️ {line}")
+        if not score["violations"]:
+            print("✅ No constraint violated")
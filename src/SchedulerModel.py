@@ -1,17 +1,73 @@
-from amplpy import AMPL
+from amplpy import AMPL, OutputHandler
+import re
+import numpy as np
+import pandas as pd
 import Params
+from ProblemInstance import FREE, FIXED_SYMBOLS
+
+# HiGHS branch-and-bound log line:
+#  L       0       0         0   0.00%   1302.5          1480              12.00%  ...  221     0.1s
+HIGHS_PROGRESS = re.compile(
+    r"^\s*[A-Za-z]?\s+(\d+)\s+(\d+)\s+(\d+)\s+([\d.]+)%\s+(\S+)\s+(\S+)\s+(\S+)"
+    r"\s+\d+\s+\d+\s+\d+\s+\d+\s+([\d.]+)s\s*$")
+
+
+def parse_float(token):
+    try:
+        return float(token.rstrip("%"))
+    except ValueError:
+        return None  # e.g. "Large"
+
+
+def parse_highs_progress(line):
+    match = HIGHS_PROGRESS.match(line)
+    if match is None:
+        return None
+    nodes, _, _, explored, bound, incumbent, gap, seconds = match.groups()
+    return {
+        "nodes": int(nodes),
+        "explored": float(explored),
+        "bound": parse_float(bound),
+        "incumbent": parse_float(incumbent),
+        "gap": parse_float(gap),
+        "seconds": float(seconds),
+    }
+
+
+class ProgressHandler(OutputHandler):
+    # receives solver output while the solve is running
+    def __init__(self, callback):
+        self.callback = callback
+        self.chunks = []
+        self.last = None
+
+    def output(self, kind, msg):
+        self.chunks.append(msg)
+        for line in msg.splitlines():
+            progress = parse_highs_progress(line)
+            if progress is not None:
+                self.last = progress
+                self.callback(progress)
 
 
 class SchedulerModel:
-    def __init__(self):
+    def __init__(self, linearized=False, solver="highs", time_limit=None, mip_gap=None):
+        # linearized: explicit deviation variables / window indicators instead of abs/max/if
+        self.linearized = linearized
+        self.solver = solver
+        self.time_limit = time_limit  # seconds, None = until optimal
+        self.mip_gap = mip_gap  # relative gap, e.g. 0.01 = stop within 1% of the bound
+        self.last_progress = None
         self.ampl = AMPL()
         # self.ampl.setOption("solver", "scip")  # dla SCIP
         # self.ampl.option["scip_options"] = "display/verblevel=4"
-        self.ampl.setOption("solver", "highs")
+        self.ampl.setOption("solver", solver)
         self.ampl.setOption('presolve', 10)
         # self.ampl.setOption('presolve', 0)
         self.ampl.setOption('show_stats', 7)
-        self.ampl.option["highs_options"] = "outlev=1"
+        self.warm_start = False
+        self._set_solver_options()
+        self.last_data = None  # inputs of the previous set_data call
         self._build_model()
 
     def _build_model(self):
@@ -37,7 +93,15 @@ class SchedulerModel:
         var x {DOCTORS, DAYS} binary;
         set REST_WINDOW_STARTS within DAYS;
         set WINDOW_STARTS within DAYS;
+        """)
+        if self.linearized:
+            self._build_linear_objective()
+        else:
+            self._build_objective()
+        self._build_constraints()
 
+    def _build_objective(self):
+        self.ampl.eval(r"""
         minimize Total_Cost:
             # 1. Basic cost
             sum {d in DOCTORS, day in DAYS} day_cost[d, day] * x[d, day]
@@ -72,7 +136,69 @@ class SchedulerModel:
                 (if prefer_sparse[d] = 1 and sum {k in 0..4} x[d, t + k] >= 2
                 then cost_per_sparse_window
                 else 0);                       
+        """)
+
+    def _build_linear_objective(self):
+        # same objective as _build_objective, written with explicit variables so that
+        # AMPL doesn't have to reformulate abs/max/if with its own big-M logic
+        self.ampl.eval(r"""
+        set PREF_DOCTORS = {d in DOCTORS : preferred_shifts[d] >= 0};
+        set PREF_WEEKDAY_DOCTORS = {d in DOCTORS : preferred_shifts_weekday[d] >= 0};
+        set PREF_WEEKEND_DOCTORS = {d in DOCTORS : preferred_shifts_weekend[d] >= 0};
+        set DENSE_DOCTORS = {d in DOCTORS : prefer_dense[d] = 1};
+        set SPARSE_DOCTORS = {d in DOCTORS : prefer_sparse[d] = 1};
+
+        # positive / negative deviations from the preferred counts
+        var pref_over {PREF_DOCTORS} >= 0;
+        var pref_under {PREF_DOCTORS} >= 0;
+        var weekday_over {PREF_WEEKDAY_DOCTORS} >= 0;
+        var weekday_under {PREF_WEEKDAY_DOCTORS} >= 0;
+        var weekend_over {PREF_WEEKEND_DOCTORS} >= 0;
+        var weekend_under {PREF_WEEKEND_DOCTORS} >= 0;
+
+        # 1 if the 5-day window starting at t holds at least 2 shifts
+        var dense_window {DENSE_DOCTORS, WINDOW_STARTS} binary;
+        var sparse_window {SPARSE_DOCTORS, WINDOW_STARTS} binary;
+
+        minimize Total_Cost:
+            sum {d in DOCTORS, day in DAYS} day_cost[d, day] * x[d, day]
+
+            + sum {d in PREF_DOCTORS}
+                penalty_for_not_preferred_shifts * (pref_over[d] + pref_under[d])
+
+            + sum {d in PREF_WEEKDAY_DOCTORS}
+                penalty_for_not_preferred_shifts * (weekday_over[d] + weekday_under[d])
+
+            + sum {d in PREF_WEEKEND_DOCTORS}
+                (penalty_for_missing_weekend_shift * weekend_under[d]
+                 + penalty_for_excess_weekend_shift * weekend_over[d])
+
+            - sum {d in DENSE_DOCTORS, t in WINDOW_STARTS} cost_per_dense_window * dense_window[d, t]
+
+            + sum {d in SPARSE_DOCTORS, t in WINDOW_STARTS} cost_per_sparse_window * sparse_window[d, t];
+
+        subject to Preferred_Deviation {d in PREF_DOCTORS}:
+            sum {day in DAYS} x[d, day] - preferred_shifts[d] = pref_over[d] - pref_under[d];
+
+        subject to Weekday_Deviation {d in PREF_WEEKDAY_DOCTORS}:
+            sum {day in DAYS : weekend[day] = 0} x[d, day] - preferred_shifts_weekday[d]
+                = weekday_over[d] - weekday_under[d];
+
+        subject to Weekend_Deviation {d in PREF_WEEKEND_DOCTORS}:
+            sum {day in DAYS : weekend[day] = 1} x[d, day] - preferred_shifts_weekend[d]
+                = weekend_over[d] - weekend_under[d];
+
+        # the reward may only be collected when the window really has 2+ shifts
+        subject to Dense_Window {d in DENSE_DOCTORS, t in WINDOW_STARTS}:
+            2 * dense_window[d, t] <= sum {k in 0..4} x[d, t + k];
 
+        # the penalty must be paid as soon as the window has 2+ shifts
+        subject to Sparse_Window {d in SPARSE_DOCTORS, t in WINDOW_STARTS}:
+            sum {k in 0..4} x[d, t + k] - 1 <= 4 * sparse_window[d, t];
+        """)
+
+    def _build_constraints(self):
+        self.ampl.eval(r"""
         subject to One_Doctor_Per_Day {day in DAYS}:
             sum {d in DOCTORS} x[d, day] = 1;
 
@@ -90,43 +216,192 @@ class SchedulerModel:
 
         subject to Fixed_Shifts_One {d in DOCTORS, day in DAYS: fixed_shift[d, day] = "1"}:
             x[d, day] = 1;
+
+        # Symmetry breaking for interchangeable doctors (a, b): b may not start
+        # before a's first shift. started[a, t] <= number of a's shifts before t.
+        set SYM_PAIRS within {DOCTORS, DOCTORS} default {};
+        set SYM_LEADERS = setof {(a, b) in SYM_PAIRS} a;
+        var started {SYM_LEADERS, DAYS} >= 0, <= 1;
+
+        subject to Started {a in SYM_LEADERS, t in DAYS}:
+            started[a, t] <= if t > 0 then started[a, t - 1] + x[a, t - 1] else 0;
+
+        subject to Symmetry_Breaking {(a, b) in SYM_PAIRS, t in DAYS}:
+            x[b, t] <= started[a, t];
                                                                      
         """)
 
-    def set_data(self, doctors, days, day_cost, min_shifts, max_shifts,
-                 preferred_shifts, preferred_shifts_weekday, preferred_shifts_weekend,
-                 prefer_dense, prefer_sparse,
-                 fixed_shifts,
-                 weekend_param ):
-        self.ampl.set['DOCTORS'] = doctors
-        self.ampl.set['DAYS'] = days
-
-        self.ampl.set['WINDOW_STARTS'] = list(range(max(days) - 3))
-        self.ampl.set['REST_WINDOW_STARTS'] = list(range(max(days) - 1))
-
-        self.ampl.param['day_cost'].setValues(day_cost)
-        self.ampl.param['min_shifts'].setValues(min_shifts)
-        self.ampl.param['max_shifts'].setValues(max_shifts)
-        self.ampl.param['preferred_shifts'].setValues(preferred_shifts)
-        self.ampl.param['preferred_shifts_weekday'].setValues(preferred_shifts_weekday)
-        self.ampl.param['preferred_shifts_weekend'].setValues(preferred_shifts_weekend)
-        self.ampl.param['prefer_dense'].setValues(prefer_dense)
-        self.ampl.param['prefer_sparse'].setValues(prefer_sparse)
+    # ProblemInstance array -> (AMPL parameter, index)
+    INDEXED_PARAMS = {
+        "day_cost": ("day_cost", "doctor_day"),
+        "min_shifts": ("min_shifts", "doctor"),
+        "max_shifts": ("max_shifts", "doctor"),
+        "preferred_shifts": ("preferred_shifts", "doctor"),
+        "preferred_shifts_weekday": ("preferred_shifts_weekday", "doctor"),
+        "preferred_shifts_weekend": ("preferred_shifts_weekend", "doctor"),
+        "prefer_dense": ("prefer_dense", "doctor"),
+        "prefer_sparse": ("prefer_sparse", "doctor"),
+        "fixed": ("fixed_shift", "doctor_day"),
+        "weekend": ("weekend", "day"),
+    }
+
+    def set_data(self, instance, symmetric_pairs=()):
+        # The model stays loaded between calls, so only entries that differ from the
+        # previous call are pushed to AMPL. A changed DOCTORS / DAYS set resets all data.
+        data = {}
+        for name in self.INDEXED_PARAMS:
+            values = np.array(getattr(instance, name))
+            data[name] = values.astype(np.int8) if values.dtype == bool else values
+        doctors, days = list(instance.doctors), instance.days
+        last = self.last_data
+
+        self.warm_start = False
+        self._set_solver_options()
+
+        if last is None or last["doctors"] != doctors or last["days"] != days:
+            if last is not None:
+                self.ampl.eval("reset data;")
+            self.ampl.set['DOCTORS'] = doctors
+            self.ampl.set['DAYS'] = days
+
+            self.ampl.set['WINDOW_STARTS'] = list(range(max(days) - 3))
+            self.ampl.set['REST_WINDOW_STARTS'] = list(range(max(days) - 1))
+            last = None
+
+        self.pushed_values = 0
+        for name, (param, index) in self.INDEXED_PARAMS.items():
+            values = data[name]
+            if last is not None:
+                changed = values != last[name]
+            elif name == "fixed":
+                changed = values != FREE  # free cells keep the "." default
+            else:
+                changed = np.ones(values.shape, dtype=bool)
+            positions = np.nonzero(changed)
+            if not len(positions[0]):
+                continue
+            entries = values[positions].tolist()
+            if name == "fixed":
+                # cells that are no longer fixed go back to the default
+                entries = [FIXED_SYMBOLS[v] for v in entries]
+            if index == "doctor_day":
+                keys = [(doctors[i], days[t]) for i, t in zip(*positions)]
+            elif index == "doctor":
+                keys = [doctors[i] for i in positions[0]]
+            else:
+                keys = [days[t] for t in positions[0]]
+            self.ampl.param[param].setValues(dict(zip(keys, entries)))
+            self.pushed_values += len(entries)
+
         self.ampl.param['cost_per_dense_window'] = Params.PENALTY_WRONG_FREQUENCY
         self.ampl.param['cost_per_sparse_window'] = Params.PENALTY_WRONG_FREQUENCY
         self.ampl.param['penalty_for_not_preferred_shifts'] = Params.PENALTY_NOT_PREFERRED_SHIFTS
         self.ampl.param['penalty_for_missing_weekend_shift'] = Params.PENALTY_MISSING_WEEKEND_SHIFT
         self.ampl.param['penalty_for_excess_weekend_shift'] = Params.PENALTY_EXCESS_WEEKEND_SHIFT
-        self.ampl.param['fixed_shift'].setValues(fixed_shifts)
-        self.ampl.param['weekend'].setValues(weekend_param)
 
-    def solve(self):
-        # self.ampl.solve()
-        self.solver_log = self.ampl.get_output("solve;")
+        symmetric_pairs = [tuple(pair) for pair in symmetric_pairs]
+        if last is None or last["symmetric_pairs"] != symmetric_pairs:
+            self.ampl.set['SYM_PAIRS'] = symmetric_pairs
+        data["symmetric_pairs"] = symmetric_pairs
+
+        data["doctors"], data["days"] = doctors, days
+        self.last_data = data
+
+    def reset(self):
+        # forget all data; the compiled model is kept
+        self.ampl.eval("reset data;")
+        self.last_data = None
+
+    def is_healthy(self):
+        try:
+            return self.ampl.get_option("solver") is not None
+        except Exception:
+            return False
+
+    def close(self):
+        self.ampl.close()
+
+    def set_initial_schedule(self, initial):
+        # doctors x days 0/1 matrix (rows as in the last set_data) handed to the solver as a MIP start
+        doctors, days = self.last_data["doctors"], self.last_data["days"]
+        self.ampl.getVariable("x").setValues(
+            {(d, day): int(initial[i, t]) for i, d in enumerate(doctors) for t, day in enumerate(days)})
+        self.warm_start = True
+        self._set_solver_options()
+
+    def _set_solver_options(self):
+        # highs / scip / gcg / gurobi all take the same AMPL (mp) driver options
+        options = ["outlev=1"]
+        if self.time_limit is not None:
+            options.append(f"lim:time={self.time_limit}")
+        if self.mip_gap is not None:
+            options.append(f"mip:gap={self.mip_gap}")
+        # no start option: the mp drivers use the x values set by set_initial_schedule as a
+        # MIP start by default (alg:start / warmstart, default 1), and an option name the
+        # driver does not know would only show up in the log
+        self.ampl.option[f"{self.solver}_options"] = " ".join(options)
+
+    def set_limits(self, time_limit=None, mip_gap=None):
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self._set_solver_options()
+
+    def solve(self, progress=None):
+        # progress(dict): called with nodes / bound / incumbent / gap for every HiGHS log line
+        self.last_progress = None
+        if progress is None:
+            # self.ampl.solve()
+            self.solver_log = self.ampl.get_output("solve;")
+            for line in self.solver_log.splitlines():
+                self.last_progress = parse_highs_progress(line) or self.last_progress
+            return
+
+        handler = ProgressHandler(progress)
+        previous = self.ampl.get_output_handler()
+        self.ampl.set_output_handler(handler)
+        try:
+            self.ampl.eval("solve;")
+        finally:
+            self.ampl.set_output_handler(previous)
+        self.solver_log = "".join(handler.chunks)
+        self.last_progress = handler.last
+
+    def warm_start_accepted(self):
+        # True / False when HiGHS reports on the user-supplied solution, None otherwise
+        if not self.warm_start:
+            return None
+        log = self.solver_log.lower()
+        if "cannot yield feasible solution" in log or "user-supplied solution is infeasible" in log:
+            return False
+        if "user-supplied" in log or "user solution" in log:
+            return True
+        return None
 
     def get_schedule(self):
         return self.ampl.getVariable("x").to_pandas()
 
+    def get_assignments(self, doctors, days):
+        # pull only the nonzero assignments instead of the full doctor x day frame
+        assigned = self.ampl.get_data(
+            "{d in DOCTORS, day in DAYS : x[d, day] > 0.5} x[d, day]").to_list()
+
+        doctor_index = {d: i for i, d in enumerate(doctors)}
+        day_index = {day: i for i, day in enumerate(days)}
+
+        # day -> doctor (None if nobody is on duty) and days x doctors 0/1 matrix
+        assignment = [None] * len(days)
+        matrix = np.zeros((len(days), len(doctors)), dtype=np.int8)
+        for doctor, day, _ in assigned:
+            i = day_index[int(day)]
+            assignment[i] = doctor
+            matrix[i, doctor_index[doctor]] = 1
+
+        return assignment, pd.DataFrame(matrix, index=list(days), columns=list(doctors))
+
+    def get_solve_result(self):
+        # "solved", "limit", "infeasible", "unbounded", "failure"
+        return self.ampl.get_value("solve_result")
+
     def get_total_cost(self):
         return self.ampl.getObjective("Total_Cost").value()
     
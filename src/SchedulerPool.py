@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Bounded pool of ready-to-use SchedulerModel (AMPL) instances shared by the whole server.
+# Models are handed out per solve, reset when they move to another owner and
+# recycled after max_uses solves or after an AMPL / solver error. Other errors raised
+# while a model is out (roster validation, infeasible rosters) only reset its data.
+import threading
+import time
+from contextlib import contextmanager
+import amplpy
+from SchedulerModel import SchedulerModel
+
+
+def is_solver_error(e):
+    # raised by amplpy / the AMPL process, not by the caller's own checks
+    return isinstance(e, amplpy.AMPLException) or type(e).__module__.split(".")[0] == "amplpy"
+
+
+class SchedulerPool :
+
+    def __init__(self, size=2, max_uses=50, factory=SchedulerModel, prewarm=True):
+        self.size = size
+        self.max_uses = max_uses
+        self.factory = factory
+        self.condition = threading.Condition()
+        self.idle = []      # [model, owner of its current data]
+        self.uses = {}      # id(model) -> number of solves served
+        self.total = 0      # instances alive or being created
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+        self.errors = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        if prewarm:
+            for _ in range(size):
+                self.total += 1
+                self._add_instance()
+
+    def _create(self):
+        model = self.factory()
+        self.uses[id(model)] = 0
+        return model
+
+    def _add_instance(self):
+        try:
+            model = self._create()
+        except Exception:
+            with self.condition:
+                self.total -= 1
+                self.errors += 1
+                self.condition.notify()
+            return
+        with self.condition:
+            self.idle.append([model, None])
+            self.condition.notify()
+
+    def _discard(self, model, replace):
+        # caller holds the lock
+        self.uses.pop(id(model), None)
+        try:
+            model.close()
+        except Exception:
+            pass
+        self.recycled += 1
+        if replace:
+            threading.Thread(target=self._add_instance, daemon=True).start()
+        else:
+            self.total -= 1
+
+    def _checkout(self, owner, timeout):
+        start = time.time()
+        with self.condition:
+            while True:
+                # prefer the instance that already holds this owner's data
+                entry = next((e for e in self.idle if owner is not None and e[1] == owner), None)
+                if entry is None and self.idle:
+                    entry = self.idle[-1]
+                if entry is not None:
+                    self.idle.remove(entry)
+                    model, previous_owner = entry
+                    if not model.is_healthy():
+                        self._discard(model, replace=False)
+                        continue
+                    self.hits += 1
+                    break
+                if self.total < self.size:
+                    self.total += 1
+                    self.misses += 1
+                    model, previous_owner = None, None
+                    break
+                remaining = None if timeout is None else timeout - (time.time() - start)
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No free solver instance")
+                self.condition.wait(remaining)
+
+            waited = time.time() - start
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        if model is None:
+            try:
+                model = self._create()
+            except Exception:
+                with self.condition:
+                    self.total -= 1
+                    self.errors += 1
+                    self.condition.notify()
+                raise
+        elif previous_owner != owner:
+            model.reset()
+        return model
+
+    def _usable_after(self, model, error):
+        # a model that saw a non-solver error is kept once its data is dropped
+        if is_solver_error(error) or not model.is_healthy():
+            return False
+        try:
+            model.reset()
+        except Exception:
+            return False
+        return True
+
+    def _checkin(self, model, owner, error):
+        broken = error is not None and not self._usable_after(model, error)
+        with self.condition:
+            self.uses[id(model)] = self.uses.get(id(model), 0) + 1
+            if broken:
+                self.errors += 1
+            if broken or self.uses[id(model)] >= self.max_uses:
+                self._discard(model, replace=True)
+            else:
+                self.idle.append([model, owner])
+            self.condition.notify()
+
+    @contextmanager
+    def acquire(self, owner=None, timeout=None):
+        model = self._checkout(owner, timeout)
+        error = None
+        try:
+            yield model
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._checkin(model, owner, error)
+
+    def stats(self):
+        with self.condition:
+            requests = self.hits + self.misses
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "busy": self.total - len(self.idle),
+                "hits": self.hits,
+                "misses": self.misses,
+                "recycled": self.recycled,
+                "errors": self.errors,
+                "avg_wait_seconds": round(self.wait_seconds / requests, 3) if requests else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+            }
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# Headless scheduling service: other systems POST a roster (JSON rows, CSV or an .xlsx
+# upload), it is queued and solved on a fixed pool of worker threads, and the job status,
+# result and service metrics are read back over HTTP. Worksheets live in local
+# (in-memory or CSV) storage, so no Google account is needed.
+#
+#   python3 Service.py --port 8080 --workers 2 --max-queue 20
+#   curl -X POST --data-binary @Ward.xlsx -H "Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" \
+#        "http://localhost:8080/jobs?worksheet=Roster"
+#   curl http://localhost:8080/jobs/<id>
+#   curl http://localhost:8080/jobs/<id>/result
+#
+# POST /jobs            roster -> 202 {"id", ...}; 400 bad roster, 413 too large, 429 queue full
+# GET  /jobs/<id>        status, phase, queue position, solver progress
+# GET  /jobs/<id>/result schedule, validation row and run report; 409 while the job is active
+# GET  /jobs/<id>/log    the job's log lines
+# GET  /metrics          queue, worker and latency figures
+# GET  /health
+import contextlib
+import csv
+import io
+import json
+import os
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import openpyxl
+
+import Processor
+from JobRunner import JobRunner
+from SchedulerPool import SchedulerPool
+from LocalStorage import CsvSpreadsheet, LocalSpreadsheet
+from SolutionCache import SolutionCache
+
+XLSX_TYPES = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/octet-stream")
+
+
+class RejectedRoster(Exception):
+    # the request can't be queued; carries the HTTP status for the client
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def rows_from_body(body, content_type, worksheet=None):
+    # request body -> (worksheet rows, worksheet title, options)
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    options = {}
+    if content_type == "application/json":
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except ValueError as e:
+            raise RejectedRoster(400, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict) or not isinstance(payload.get("rows"), list):
+            raise RejectedRoster(400, 'Expected {"rows": [[...], ...]}')
+        rows = payload["rows"]
+        worksheet = payload.get("worksheet") or worksheet
+        options = {name: payload[name] for name in ("time_limit", "mip_gap", "force_solve") if name in payload}
+    elif content_type == "text/csv":
+        rows = list(csv.reader(io.StringIO(body.decode("utf-8-sig"))))
+    elif content_type in XLSX_TYPES:
+        try:
+            workbook = openpyxl.load_workbook(io.BytesIO(body), data_only=True)
+        except Exception as e:
+            raise RejectedRoster(400, f"Unreadable .xlsx file: {e}")
+        if worksheet is not None and worksheet not in workbook.sheetnames:
+            raise RejectedRoster(400, f"No worksheet {worksheet!r} in the file")
+        sheet = workbook[worksheet] if worksheet is not None else workbook.worksheets[0]
+        worksheet = sheet.title
+        rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+    else:
+        raise RejectedRoster(415, f"Unsupported content type {content_type!r} (JSON, CSV or .xlsx)")
+
+    if not rows or not all(isinstance(row, list) for row in rows) or len(rows[0]) < 2:
+        raise RejectedRoster(400, "The roster needs a header row with at least one doctor")
+    worksheet = worksheet or "Roster"
+    # the title becomes a file name with --storage
+    if not re.fullmatch(r"[\w][\w .-]*", worksheet) or worksheet.endswith("-sched"):
+        raise RejectedRoster(400, f"Invalid worksheet title {worksheet!r}")
+    return rows, worksheet, options
+
+
+class ScheduleService :
+
+    def __init__(self, workers=2, max_queue=20, max_per_client=5, job_timeout=300, max_body_bytes=10 * 1024 * 1024,
+                 backend="highs", storage=None, cache=None, keep_seconds=3600, settings=None):
+        self.runner = JobRunner(max_workers=workers, keep_seconds=keep_seconds)
+        self.workers = workers
+        self.max_queue = max_queue  # queued (not yet running) jobs before new ones get 429
+        self.max_per_client = max_per_client  # active jobs per client
+        self.job_timeout = job_timeout  # seconds from submission, queue wait included
+        self.max_body_bytes = max_body_bytes
+        self.backend = backend
+        self.settings = settings or {}  # Processor.SETTINGS switches applied to every job
+        self.storage = storage  # directory for CSV copies of every job's worksheets, None = memory only
+        self.cache = cache  # SolutionCache or None
+        # AMPL instances are expensive to start, workers share a pool of loaded models
+        self.pool = SchedulerPool(size=workers) if backend == "ampl" else None
+        self.started = time.time()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.lock = threading.Lock()
+
+    def submit(self, rows, title, owner, options=None):
+        options = options or {}
+        timeout = min(float(options.get("time_limit") or self.job_timeout), self.job_timeout)
+        with self.lock:
+            jobs = self.runner.all()
+            queued = sum(job.status == "queued" for job in jobs)
+            mine = sum(job.active and job.owner == owner for job in jobs)
+            if queued >= self.max_queue:
+                self.rejected += 1
+                raise RejectedRoster(429, f"Queue full ({queued} jobs waiting), try again later")
+            if mine >= self.max_per_client:
+                self.rejected += 1
+                raise RejectedRoster(429, f"{mine} jobs of this client are still active")
+            self.admitted += 1
+            return self.runner.submit( owner, title,
+                lambda job : self.run_job( job, rows, title, timeout, options.get("mip_gap"), bool(options.get("force_solve")) ) )
+
+    def open_spreadsheet(self, job, rows, title):
+        if self.storage is None:
+            return LocalSpreadsheet(job.id, {title: rows})
+        path = os.path.join(self.storage, job.id)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f"{title}.csv"), "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        return CsvSpreadsheet(path)
+
+    def expire(self, timeout, where):
+        with self.lock:
+            self.timed_out += 1
+        raise Exception(f"Timed out after {timeout:.0f}s {where}")
+
+    def run_job(self, job, rows, title, timeout, mip_gap, force_solve):
+        # runs on a worker thread; the solver gets what is left of the job's timeout
+        remaining = timeout - (time.time() - job.submitted)
+        if remaining <= 1:
+            self.expire(timeout, "in the queue")
+
+        spreadsheet = self.open_spreadsheet(job, rows, title)
+        processor = Processor.Processor()
+        processor.set_logging( job.log )
+        processor.set_progress( job.set_progress )
+        processor.backend = self.backend
+        processor.configure( self.settings )
+        processor.time_limit = remaining
+        processor.mip_gap = mip_gap
+        processor.cache = self.cache
+        processor.force_solve = force_solve
+        job.processor = processor
+        processor.begin_writes( spreadsheet )
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.pool is not None:
+                    try:
+                        processor.set_model( stack.enter_context( self.pool.acquire( owner=job.owner, timeout=remaining ) ) )
+                    except TimeoutError:
+                        self.expire(timeout, "waiting for a solver")
+                processor.process_worksheet( spreadsheet, spreadsheet.worksheet(title) )
+            # the solver stops at the time limit, model build and loading may still overrun
+            if time.time() - job.submitted > timeout:
+                self.expire(timeout, "before exporting")
+            processor.phase = "exporting"
+            processor.export_schedule_to_full_sheet()
+            processor.export_schedule_to_short_sheet()
+        finally:
+            processor.commit_writes()
+        processor.phase = "done"
+        job.phase = "done"
+        # exported, but past the deadline: kept, counted and flagged in the result
+        late = time.time() - job.submitted > timeout
+        if late:
+            with self.lock:
+                self.timed_out += 1
+            job.log(f"⚠️ Finished after the {timeout:.0f}s job timeout")
+
+        return {
+            "timed_out": late,
+            "total_cost": processor.total_cost,
+            "optimal": processor.optimal,
+            "gap": processor.gap,
+            "cache_hit": processor.cache_hit,
+            "method": processor.method,
+            "assignment": [{"date": date, "doctor": doctor}
+                           for date, doctor in zip(processor.date_labels, processor.assignment)],
+            "validation": processor.validation_row,
+            "full_schedule": spreadsheet.worksheet(f"{title}-full-sched").get_all_values(),
+            "short_schedule": spreadsheet.worksheet(f"{title}-short-sched").get_all_values(),
+            "report": processor.report.to_dict(),
+        }
+
+    def status(self, job):
+        queued_before = sum(other.status == "queued" and other.submitted < job.submitted
+                            for other in self.runner.all()) if job.status == "queued" else 0
+        return {
+            "id": job.id,
+            "title": job.title,
+            "status": job.status,
+            "phase": job.current_phase,
+            "queue_position": queued_before + 1 if job.status == "queued" else None,
+            "waited_seconds": round((job.started or time.time()) - job.submitted, 3),
+            "run_seconds": round(job.seconds, 3),
+            "progress": job.progress,
+            "error": job.error,
+        }
+
+    def metrics(self):
+        jobs = self.runner.all()
+        finished = [job for job in jobs if job.finished is not None]
+        run_seconds = sorted(job.seconds for job in finished)
+        wait_seconds = sorted(job.started - job.submitted for job in jobs if job.started is not None)
+
+        def summary(values):
+            if not values:
+                return None
+            return {"count": len(values), "mean": round(statistics.mean(values), 3),
+                    "p50": round(values[len(values) // 2], 3),
+                    "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                    "max": round(values[-1], 3)}
+
+        with self.lock:
+            counters = {"admitted": self.admitted, "rejected": self.rejected, "timed_out": self.timed_out}
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "jobs": self.runner.stats(),
+            "requests": counters,
+            "run_seconds": summary(run_seconds),
+            "wait_seconds": summary(wait_seconds),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "pool": self.pool.stats() if self.pool is not None else None,
+        }
+
+
+class ServiceHandler(BaseHTTPRequestHandler) :
+    # self.server.service is the ScheduleService
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def client_id(self):
+        return self.headers.get("X-Client-Id") or self.client_address[0]
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            return self.send_json(404, {"error": "Not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > service.max_body_bytes:
+            return self.send_json(413, {"error": f"Roster larger than {service.max_body_bytes} bytes"})
+        body = self.rfile.read(length)
+        query = parse_qs(url.query)
+        try:
+            rows, title, options = rows_from_body(body, self.headers.get("Content-Type"),
+                                                  (query.get("worksheet") or [None])[0])
+            for name in ("time_limit", "mip_gap"):
+                if name in query:
+                    options[name] = float(query[name][0])
+            job = service.submit(rows, title, self.client_id(), options)
+        except RejectedRoster as e:
+            headers = {"Retry-After": "30"} if e.status == 429 else None
+            return self.send_json(e.status, {"error": str(e)}, headers)
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        self.send_json(202, dict(service.status(job), status_url=f"/jobs/{job.id}",
+                                 result_url=f"/jobs/{job.id}/result"),
+                       {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            return self.send_json(200, {"ok": True})
+        if path == "/metrics":
+            return self.send_json(200, service.metrics())
+
+        match = re.fullmatch(r"/jobs/([0-9a-f]+)(/result|/log)?", path)
+        job = service.runner.get(match[1]) if match else None
+        if job is None:
+            return self.send_json(404, {"error": "Unknown job"})
+        if match[2] == "/log":
+            return self.send_json(200, {"id": job.id, "lines": job.output().splitlines()})
+        if match[2] == "/result":
+            if job.active:
+                return self.send_json(409, service.status(job), {"Retry-After": "5"})
+            if job.status == "failed":
+                return self.send_json(422, service.status(job))
+            return self.send_json(200, dict(service.status(job), **job.result))
+        self.send_json(200, service.status(job))
+
+    def log_message(self, format, *args):
+        pass  # no access log on stderr
+
+
+def serve(service, host="127.0.0.1", port=8080):
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="rosters solved at the same time")
+    parser.add_argument("--max-queue", type=int, default=20, help="waiting rosters before new ones are refused")
+    parser.add_argument("--max-per-client", type=int, default=5, help="active rosters per X-Client-Id / address")
+    parser.add_argument("--job-timeout", type=float, default=300, help="seconds per roster, queue wait included")
+    parser.add_argument("--backend", default="highs", help='"highs" (no AMPL needed), "ampl" or "heuristic" (no MIP)')
+    parser.add_argument("--storage", default=None, help="keep each job's worksheets as CSV files in this directory")
+    parser.add_argument("--cache", default=None, help="directory of the solution cache (off by default)")
+    Processor.add_settings_arguments( parser )
+    args = parser.parse_args()
+
+    service = ScheduleService(workers=args.workers, max_queue=args.max_queue, max_per_client=args.max_per_client,
+                              job_timeout=args.job_timeout, backend=args.backend, storage=args.storage,
+                              cache=SolutionCache(args.cache) if args.cache else None,
+                              settings=Processor.settings_from_arguments( args ))
+    server = serve(service, args.host, args.port)
+    print(f"Scheduling service on http://{args.host}:{args.port} ({args.workers} worker(s), {args.backend})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    service.runner.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# Read-side cache in front of a gspread client (or a LocalStorage client).
+# Spreadsheet listings and worksheet metadata are kept for a TTL; worksheet values are
+# revalidated against the spreadsheet revision (Drive modifiedTime) when the client
+# provides one, and kept for a TTL otherwise. Concurrent identical reads share one
+# API call, writes through the wrappers invalidate what they change, and quota errors
+# are retried with exponential backoff.
+import random
+import threading
+import time
+
+
+def is_quota_error(e):
+    # gspread APIError carries the HTTP status in .code / .response.status_code
+    code = getattr(e, "code", None)
+    if code is None:
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    return code in (429, 503) or "RATE_LIMIT_EXCEEDED" in str(e) or "Quota exceeded" in str(e)
+
+
+class SheetsCache :
+
+    def __init__(self, listing_ttl=300, values_ttl=30, revalidate_after=5,
+                 retries=5, backoff=1.0, max_backoff=32.0, sleep=time.sleep, clock=time.time):
+        self.listing_ttl = listing_ttl  # openall() / worksheets()
+        self.values_ttl = values_ttl  # get_all_values() without revision support
+        self.revalidate_after = revalidate_after  # get_all_values() with revision support
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.clock = clock
+        self.entries = {}  # key -> (fetched at, revision, value)
+        self.inflight = {}  # key -> threading.Event of the running fetch
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.retried = 0
+
+    def call(self, function, *args, **kwargs):
+        # API call with exponential backoff (and jitter) on quota errors
+        for attempt in range(self.retries + 1):
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.retries or not is_quota_error(e):
+                    raise
+                with self.lock:
+                    self.retried += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                self.sleep(delay * (0.5 + random.random() / 2))
+
+    def get(self, key, fetch, ttl, revision=None):
+        # cached value of fetch(); revision() is checked once the entry is older than ttl
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and self.clock() - entry[0] < ttl:
+                    self.hits += 1
+                    return entry[2]
+                event = self.inflight.get(key)
+                if event is None:
+                    event = self.inflight[key] = threading.Event()
+                    break
+            # the same read is already running in another thread, share its result
+            event.wait()
+
+        try:
+            current = self.call(revision) if revision is not None else None
+            if entry is not None and current is not None and current == entry[1]:
+                with self.lock:
+                    self.revalidations += 1
+                    self.entries[key] = (self.clock(), current, entry[2])
+                return entry[2]
+            value = self.call(fetch)
+            with self.lock:
+                self.misses += 1
+                self.entries[key] = (self.clock(), current, value)
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            event.set()
+
+    def invalidate(self, prefix=()):
+        # drop every key starting with prefix, everything by default
+        with self.lock:
+            for key in [k for k in self.entries if k[:len(prefix)] == prefix]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "revalidations": self.revalidations, "retries": self.retried}
+
+
+class CachedClient :
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache or SheetsCache()
+
+    def openall(self):
+        spreadsheets = self.cache.get(("openall",), lambda: self.client.openall(), self.cache.listing_ttl)
+        return [CachedSpreadsheet(ss, self.cache) for ss in spreadsheets]
+
+    def open(self, title):
+        for ss in self.openall():
+            if ss.title == title:
+                return ss
+        return CachedSpreadsheet(self.cache.call(self.client.open, title), self.cache)
+
+    def refresh(self):
+        self.cache.invalidate()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class CachedSpreadsheet :
+
+    def __init__(self, spreadsheet, cache):
+        self.spreadsheet = spreadsheet
+        self.cache = cache
+        self.title = spreadsheet.title
+        self.id = spreadsheet.id
+
+    def has_revision(self):
+        return hasattr(self.spreadsheet, "get_lastUpdateTime")
+
+    def revision(self):
+        return self.spreadsheet.get_lastUpdateTime()
+
+    def worksheets(self):
+        worksheets = self.cache.get(("worksheets", self.id), self.spreadsheet.worksheets, self.cache.listing_ttl)
+        return [CachedWorksheet(ws, self) for ws in worksheets]
+
+    def fresh_worksheets(self):
+        # listing straight from the API (and re-cached), for writers that need current sheet ids
+        self.cache.invalidate(("worksheets", self.id))
+        return self.worksheets()
+
+    def worksheet(self, title):
+        # answered from the cached listing; unknown titles still ask the API (and raise)
+        for ws in self.worksheets():
+            if ws.title == title:
+                return ws
+        return CachedWorksheet(self.cache.call(self.spreadsheet.worksheet, title), self)
+
+    def add_worksheet(self, *args, **kwargs):
+        worksheet = self.cache.call(self.spreadsheet.add_worksheet, *args, **kwargs)
+        self.cache.invalidate(("worksheets", self.id))
+        return CachedWorksheet(worksheet, self)
+
+    def del_worksheet(self, worksheet):
+        worksheet = getattr(worksheet, "worksheet", worksheet)
+        self.cache.call(self.spreadsheet.del_worksheet, worksheet)
+        self.cache.invalidate(("worksheets", self.id))
+        self.cache.invalidate(("values", self.id, worksheet.title))
+
+    def batch_update(self, body):
+        result = self.cache.call(self.spreadsheet.batch_update, body)
+        self.invalidate()
+        return result
+
+    def invalidate(self):
+        self.cache.invalidate(("worksheets", self.id))
+        self.cache.invalidate(("values", self.id))
+
+    def __getattr__(self, name):
+        return getattr(self.spreadsheet, name)
+
+
+class CachedWorksheet :
+
+    def __init__(self, worksheet, spreadsheet):
+        self.worksheet = worksheet
+        self.cached_spreadsheet = spreadsheet
+        self.cache = spreadsheet.cache
+        self.title = worksheet.title
+
+    def key(self):
+        return ("values", self.cached_spreadsheet.id, self.title)
+
+    def get_all_values(self):
+        if self.cached_spreadsheet.has_revision():
+            values = self.cache.get(self.key(), self.worksheet.get_all_values,
+                                    self.cache.revalidate_after, self.cached_spreadsheet.revision)
+        else:
+            values = self.cache.get(self.key(), self.worksheet.get_all_values, self.cache.values_ttl)
+        return [list(row) for row in values]  # callers may modify their copy
+
+    def update(self, *args, **kwargs):
+        result = self.cache.call(self.worksheet.update, *args, **kwargs)
+        self.cache.invalidate(self.key())
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.worksheet, name)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# On-disk cache of solved schedules, keyed by a hash of everything that affects the
+# solution: the parsed instance, the Params weights and the solver settings.
+# One JSON file per entry; the file mtime is the last use, for LRU eviction.
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import Params
+
+INSTANCE_ARRAYS = ["weekend", "fixed", "preference", "enabled", "min_shifts", "max_shifts",
+                   "preferred_shifts", "preferred_shifts_weekday", "preferred_shifts_weekend",
+                   "prefer_dense", "prefer_sparse"]
+
+
+def params_weights():
+    return {name: getattr(Params, name) for name in sorted(dir(Params)) if name.isupper()}
+
+
+def instance_key(instance, settings):
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "doctors": instance.doctors,
+        "date_labels": instance.date_labels,
+        "params": params_weights(),
+        "settings": settings,
+    }, sort_keys=True, default=str).encode("utf-8"))
+    for name in INSTANCE_ARRAYS:
+        values = np.ascontiguousarray(getattr(instance, name))
+        digest.update(f"{name}:{values.dtype.str}:{values.shape}".encode("utf-8"))
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+class SolutionCache :
+
+    def __init__(self, directory="solution_cache", max_entries=500, max_bytes=50 * 1024 * 1024,
+                 max_age_days=30):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, instance, settings):
+        return instance_key(instance, settings)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        entry = dict(entry, key=key, created=time.strftime("%Y-%m-%d %H:%M:%S"))
+        path = self.path(key)
+        # write + rename, so concurrent readers never see half a file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(entry, f, default=str)
+        os.replace(temporary, path)
+        self.evict()
+
+    def invalidate(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        # drop entries past max_age, then least recently used ones over the count / size budget
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        files = [f for f in os.listdir(self.directory) if f.endswith(".json")]
+        return {
+            "entries": len(files),
+            "bytes": sum(os.path.getsize(os.path.join(self.directory, f)) for f in files),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# Runs the same instance on several solvers at once, each in its own process with its
+# own AMPL, and keeps the first proven-optimal result (or the best incumbent at the deadline).
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from datetime import datetime
+from amplpy import modules
+from SchedulerModel import SchedulerModel
+from HighsSchedulerModel import HighsSchedulerModel
+
+PORTFOLIO_SOLVERS = ["highs", "scip", "gcg", "gurobi"]
+
+# extra time given to the processes after the solver time limit to report back
+DEADLINE_GRACE_SECONDS = 10
+# how often the race checks for workers that died without reporting
+POLL_SECONDS = 0.5
+
+
+def _result(solver, seconds=None, error=None):
+    return {"solver": solver, "status": "failure", "objective": None, "gap": None,
+            "assignment": None, "matrix": None, "error": error, "log": None, "seconds": seconds}
+
+
+def available_solvers(candidates=PORTFOLIO_SOLVERS):
+    installed = modules.installed()
+    return [s for s in candidates if s in installed]
+
+
+def _solve_with(solver, instance, symmetric_pairs, initial, linearized, time_limit, mip_gap, backend, results):
+    # own process group, so the AMPL and solver child processes can be killed together
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    start = time.time()
+    result = _result(solver)
+    try:
+        # the "highs" backend drives HiGHS through highspy, every other solver goes through AMPL
+        if solver == "highs" and backend == "highs":
+            model = HighsSchedulerModel(time_limit=time_limit, mip_gap=mip_gap)
+        else:
+            model = SchedulerModel(linearized=linearized, solver=solver, time_limit=time_limit, mip_gap=mip_gap)
+        model.set_data(instance, symmetric_pairs)
+        if initial is not None:
+            model.set_initial_schedule(initial)
+        model.solve()
+        result["status"] = model.get_solve_result()
+        if result["status"] in ("solved", "limit"):
+            result["assignment"], result["matrix"] = model.get_assignments(instance.doctors, instance.days)
+            if None not in result["assignment"]:
+                result["objective"] = model.get_total_cost()
+        result["gap"] = model.last_progress["gap"] if model.last_progress else None
+        result["log"] = model.get_server_log()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.time() - start, 3)
+    results.put(result)
+
+
+def _kill(process):
+    if not process.is_alive():
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.terminate()
+    except OSError:
+        process.terminate()
+    process.join(1)
+
+
+def solve_portfolio(instance, symmetric_pairs=(), solvers=None, deadline=None, initial=None, linearized=False,
+                    time_limit=None, mip_gap=None, backend="ampl", log=print):
+    # instance: ProblemInstance, as passed to SchedulerModel.set_data; every solver stops
+    # at the earlier of deadline and time_limit
+    solvers = solvers or available_solvers()
+    if not solvers:
+        raise Exception("No solver modules available for the portfolio")
+    limits = [limit for limit in (deadline, time_limit) if limit is not None]
+    deadline = min(limits) if limits else None
+
+    results = multiprocessing.Queue()
+    processes = {
+        solver: multiprocessing.Process(
+            target=_solve_with, daemon=True,
+            args=(solver, instance, symmetric_pairs, initial, linearized, deadline, mip_gap, backend, results))
+        for solver in solvers
+    }
+    start = time.time()
+    for process in processes.values():
+        process.start()
+    log(f"Portfolio: racing {', '.join(solvers)}")
+
+    finished = {}
+    winner = None
+    end = None if deadline is None else start + deadline + DEADLINE_GRACE_SECONDS
+    exited = set()  # seen dead once; failed if their result is still missing at the next poll
+    while len(finished) < len(processes):
+        if end is not None and time.time() >= end:
+            break
+        try:
+            result = results.get(timeout=POLL_SECONDS if end is None else max(0, min(POLL_SECONDS, end - time.time())))
+        except queue.Empty:
+            for solver, process in processes.items():
+                if solver in finished or process.is_alive():
+                    continue
+                if solver in exited:
+                    finished[solver] = _result(solver, round(time.time() - start, 3),
+                                               f"worker exited with code {process.exitcode} without a result")
+                    log(f"Portfolio: {solver} {finished[solver]['error']}")
+                exited.add(solver)
+            continue
+        finished[result["solver"]] = result
+        log(f"Portfolio: {result['solver']} finished in {result['seconds']}s "
+            f"({result['status']}, objective={result['objective']})")
+        if result["status"] == "solved" and result["objective"] is not None:
+            winner = result
+            break
+
+    for process in processes.values():
+        _kill(process)
+
+    if winner is None:
+        # no proven optimum: best incumbent among the solvers that reported one
+        candidates = [r for r in finished.values() if r["objective"] is not None]
+        winner = min(candidates, key=lambda r: r["objective"], default=None)
+
+    elapsed = round(time.time() - start, 3)
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "doctors": len(instance.doctors),
+        "days": instance.num_days,
+        "winner": winner["solver"] if winner else None,
+        "optimal": bool(winner and winner["status"] == "solved"),
+        "seconds": elapsed,
+        "solvers": {
+            solver: {"status": finished[solver]["status"], "seconds": finished[solver]["seconds"],
+                     "objective": finished[solver]["objective"], "error": finished[solver]["error"]}
+            if solver in finished else {"status": "killed", "seconds": elapsed}
+            for solver in solvers
+        },
+    }
+    return winner, report
+
+
+def record_report(report, path="portfolio_results.jsonl"):
+    # one line per run, to see which solver suits which instance size
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report) + "\n")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# What-if runs over the Params weights: one parsed worksheet is solved once per variant
+# (a dict of Params overrides, e.g. {"PENALTY_NOT_PREFERRED_SHIFTS": 8}) on a pool of
+# worker processes. Each worker keeps its model between variants, so the AMPL backend
+# only receives the scalars and day_cost entries that changed. The result is a table of
+# objective components, shift spread and solve time per variant:
+#
+#   python3 WeightSweep.py rosters/Ward.xlsx --worksheet Roster \
+#       --grid PENALTY_NOT_PREFERRED_SHIFTS=2,4,8 --grid COST_VOID=100,150 --workers 4
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+import Params
+import Processor
+import ScheduleScorer
+
+# weights a variant may override
+WEIGHTS = ["BASE_COST", "PENALTY_MISSING_WEEKEND_SHIFT", "PENALTY_NOT_PREFERRED_SHIFTS",
+           "PENALTY_EXCESS_WEEKEND_SHIFT", "PENALTY_MODIFIER_WILLING", "PENALTY_WRONG_FREQUENCY", "COST_VOID"]
+
+_models = {}  # backend -> model kept by this worker process
+
+
+def check_overrides(overrides):
+    for name, value in overrides.items():
+        if name not in WEIGHTS:
+            raise Exception(f"Unknown weight: {name} (one of {', '.join(WEIGHTS)})")
+        if not isinstance(value, (int, float)):
+            raise Exception(f"Weight {name} must be a number, got {value!r}")
+
+
+def effective_overrides(overrides):
+    # Params sets COST_VOID = 10 * BASE_COST at import: keep that rule when only BASE_COST changes
+    effective = dict(overrides)
+    if "BASE_COST" in overrides and "COST_VOID" not in overrides:
+        effective["COST_VOID"] = 10 * overrides["BASE_COST"]
+    return effective
+
+
+@contextmanager
+def params_override(overrides):
+    # Params are module globals read while the model data is built: only safe in a
+    # process of its own, or when variants run one after another
+    overrides = effective_overrides(overrides)
+    saved = {name: getattr(Params, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(Params, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(Params, name, value)
+
+
+def grid(**values):
+    # grid(COST_VOID=[100, 150], BASE_COST=[10, 15]) -> every combination as an override dict
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[n] for n in names))]
+
+
+def objective_components(instance, assignment):
+    # counts behind every Total_Cost term of the schedule and their cost under the current Params
+    x = ScheduleScorer.assignment_matrix(instance, assignment)
+    scorer = ScheduleScorer.ScheduleScorer(instance)
+    terms = scorer.terms(x)
+    counts = {name: int(value) for name, value in terms.items() if name != "day_cost"}
+    costs = {name: float(value) for name, value in scorer.costs(terms).items()}
+    shifts = {d: int(n) for d, n, regular in zip(instance.doctors, x.sum(axis=1), instance.regular) if regular}
+    return counts, costs, shifts
+
+
+def solve_variant(instance, overrides, settings):
+    # runs in a worker process; the model is created once and reused for the next variants
+    start = time.time()
+    result = {"overrides": overrides, "status": "ok", "error": None}
+    processor = Processor.Processor()
+    processor.set_logging( lambda line : None )
+    processor.backend = settings.get("backend", "highs")
+    processor.linearized = settings.get("linearized", False)
+    processor.symmetry_breaking = settings.get("symmetry_breaking", False)
+    processor.time_limit = settings.get("time_limit")
+    processor.mip_gap = settings.get("mip_gap")
+    key = (processor.backend, processor.linearized)
+    try:
+        if key not in _models:
+            _models[key] = processor.create_model()
+        processor.set_model( _models[key] )
+        processor.instance = instance
+        with params_override(overrides):
+            processor.solve_model()
+            counts, costs, shifts = objective_components(instance, processor.assignment)
+            result["weights"] = {name: getattr(Params, name) for name in WEIGHTS}
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        _models.pop(key, None)  # start the next variant on a fresh model
+        return result
+
+    values = np.array(list(shifts.values()))
+    result.update({
+        "total_cost": float(processor.total_cost),
+        "optimal": processor.optimal,
+        "gap": processor.gap,
+        "solve_seconds": round(processor.solve_seconds, 3),
+        "seconds": round(time.time() - start, 3),
+        "pushed_values": processor.pushed_values,
+        "counts": counts,
+        "costs": costs,
+        "shifts": shifts,
+        "spread": {"min": int(values.min()), "max": int(values.max()), "std": round(float(values.std()), 2)}
+                  if len(values) else None,
+        "assignment": list(processor.assignment),
+    })
+    return result
+
+
+def prepare_instance(data, log=print):
+    # worksheet values -> the instance every variant solves (validated, disabled doctors removed)
+    processor = Processor.Processor()
+    processor.set_logging( log )
+    processor.load_data( data )
+    processor.build_validation_row()
+    processor.ensure_feasible()
+    processor.remove_disabled_doctors()
+    return processor.instance
+
+
+def sweep(instance, variants, settings=None, workers=None, log=print):
+    # solves the current Params first, then every variant; returns one result per run
+    settings = settings or {}
+    for overrides in variants:
+        check_overrides(overrides)
+    variants = [{}] + [dict(overrides) for overrides in variants if overrides]
+    log(f"Weight sweep: {len(variants)} variant(s) on {workers or 'all'} worker(s)")
+
+    start = time.time()
+    if workers == 1:
+        results = [solve_variant(instance, overrides, settings) for overrides in variants]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(solve_variant, [instance] * len(variants), variants, [settings] * len(variants)))
+    log("Weight sweep finished in {:.2f}s".format(time.time() - start))
+
+    baseline = results[0]
+    for result in results:
+        if result["status"] == "ok" and baseline["status"] == "ok":
+            result["changed_days"] = sum(a != b for a, b in zip(result["assignment"], baseline["assignment"]))
+    return results
+
+
+def comparison_table(results):
+    # one row per variant: overrides, objective components, shift spread and solve time
+    rows = []
+    for result in results:
+        row = {"variant": ", ".join(f"{name}={value}" for name, value in result["overrides"].items()) or "current"}
+        derived = {name: value for name, value in effective_overrides(result["overrides"]).items()
+                   if name not in result["overrides"]}
+        if derived:
+            row["variant"] += " ({})".format(", ".join(f"{name}={value}" for name, value in derived.items()))
+        if result["status"] != "ok":
+            row["error"] = result["error"]
+            rows.append(row)
+            continue
+        row["total_cost"] = round(result["total_cost"], 2)
+        row.update({f"cost {name}": round(value, 2) for name, value in result["costs"].items()})
+        row.update(result["counts"])
+        row["shifts min-max"] = "{}-{}".format(result["spread"]["min"], result["spread"]["max"]) if result["spread"] else ""
+        row["shifts std"] = result["spread"]["std"] if result["spread"] else None
+        row["changed_days"] = result.get("changed_days")
+        row["optimal"] = result["optimal"]
+        row["solve_seconds"] = result["solve_seconds"]
+        rows.append(row)
+    return rows
+
+
+def format_table(rows):
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    cells = [[str(row.get(column, "")) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.rjust(width) for column, width in zip(columns, widths))]
+    lines += ["  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in cells]
+    return "\n".join(lines)
+
+
+def parse_grid(specs):
+    # ["COST_VOID=100,150", ...] -> {"COST_VOID": [100, 150], ...}
+    values = {}
+    for spec in specs:
+        name, _, listed = spec.partition("=")
+        values[name.strip()] = [float(v) if "." in v else int(v) for v in listed.split(",") if v.strip()]
+    return values
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from LocalStorage import CsvSpreadsheet, XlsxSpreadsheet
+    parser = argparse.ArgumentParser()
+    parser.add_argument("spreadsheet", help=".xlsx file or directory of .csv files")
+    parser.add_argument("--worksheet", required=True)
+    parser.add_argument("--grid", action="append", default=[], help="NAME=v1,v2,... (every combination is solved)")
+    parser.add_argument("--variants", default=None, help="JSON file with a list of override dicts")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", default="highs", help='"highs" (no AMPL needed) or "ampl"')
+    parser.add_argument("--time-limit", type=float, default=None)
+    parser.add_argument("--mip-gap", type=float, default=None)
+    parser.add_argument("--output", default=None, help="write all results to this JSON file")
+    args = parser.parse_args()
+
+    spreadsheet = CsvSpreadsheet(args.spreadsheet) if os.path.isdir(args.spreadsheet) else XlsxSpreadsheet(args.spreadsheet)
+    instance = prepare_instance(spreadsheet.worksheet(args.worksheet).get_all_values(), log=lambda line : None)
+    variants = grid(**parse_grid(args.grid)) if args.grid else []
+    if args.variants:
+        with open(args.variants, "r", encoding="utf-8") as f:
+            variants += json.load(f)
+    settings = {"backend": args.backend, "time_limit": args.time_limit, "mip_gap": args.mip_gap}
+    results = sweep(instance, variants, settings, workers=args.workers)
+    print(format_table(comparison_table(results)))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1, default=str)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# Collects every write of a run (validation row, result sheets, weekend colours) and
+# sends them to the spreadsheet as one batch_update request. Result sheets that
+# already exist are diffed against their current values and only changed rows are
+# rewritten, instead of deleting and recreating the sheet.
+import random
+
+RED = {"red": 1, "green": 0, "blue": 0}
+VALUE_FIELDS = "userEnteredValue"
+FORMAT_FIELDS = "userEnteredValue,userEnteredFormat.textFormat.foregroundColor"
+
+
+def cell_data(value, color=None):
+    cell = {}
+    if value is not None and str(value) != "":
+        cell["userEnteredValue"] = {"stringValue": str(value)}
+    if color is not None:
+        cell["userEnteredFormat"] = {"textFormat": {"foregroundColor": color}}
+    return cell
+
+
+def update_cells(sheet_id, row, col, values, colors=None):
+    # values: rows of cells starting at (row, col), zero-based; colors: {(row, col): rgb}
+    rows = [{"values": [cell_data(value, colors.get((row + i, col + j)) if colors is not None else None)
+                        for j, value in enumerate(cells)]}
+            for i, cells in enumerate(values)]
+    return {"updateCells": {
+        "range": {"sheetId": sheet_id, "startRowIndex": row, "startColumnIndex": col},
+        "rows": rows,
+        "fields": FORMAT_FIELDS if colors is not None else VALUE_FIELDS,
+    }}
+
+
+def pad(values, height, width):
+    rows = [[str(v) for v in row] + [""] * (width - len(row)) for row in values]
+    return rows + [[""] * width for _ in range(height - len(rows))]
+
+
+class WritePlan :
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self.requests = []
+        self.sheets = None  # title -> worksheet, read once per plan
+        self.added_ids = set()
+        self.changed_rows = 0
+
+    def existing_sheets(self):
+        if self.sheets is None:
+            # a cached listing (CachedSpreadsheet) may still hold a sheet deleted by hand
+            fresh = getattr(self.spreadsheet, "fresh_worksheets", None)
+            worksheets = fresh() if fresh is not None else self.spreadsheet.worksheets()
+            self.sheets = {ws.title: ws for ws in worksheets}
+        return self.sheets
+
+    def new_sheet_id(self):
+        used = {ws.id for ws in self.existing_sheets().values()} | self.added_ids
+        while True:
+            sheet_id = random.randint(1, 2 ** 31 - 1)
+            if sheet_id not in used:
+                self.added_ids.add(sheet_id)
+                return sheet_id
+
+    def set_values(self, worksheet, row, col, values):
+        self.requests.append(update_cells(worksheet.id, row, col, values))
+        self.changed_rows += len(values)
+
+    def write_sheet(self, title, values, colors=None):
+        # make sheet `title` hold exactly `values` (and colors, {(row, col): rgb})
+        colors = colors or {}
+        height = len(values)
+        width = max((len(row) for row in values), default=0)
+        existing = self.existing_sheets().get(title)
+
+        if existing is None:
+            sheet_id = self.new_sheet_id()
+            self.requests.append({"addSheet": {"properties": {
+                "sheetId": sheet_id, "title": title,
+                "gridProperties": {"rowCount": max(height, 1), "columnCount": max(width, 1)}}}})
+            self.requests.append(update_cells(sheet_id, 0, 0, pad(values, height, width), colors))
+            self.changed_rows += height
+            return
+
+        old = existing.get_all_values()
+        # old cells outside the new values are cleared, so diff over the larger extent
+        height = max(height, len(old))
+        width = max(width, max((len(row) for row in old), default=0))
+        grid_rows = getattr(existing, "row_count", height)
+        grid_cols = getattr(existing, "col_count", width)
+        if grid_rows < height or grid_cols < width:
+            self.requests.append({"updateSheetProperties": {
+                "properties": {"sheetId": existing.id,
+                               "gridProperties": {"rowCount": max(grid_rows, height),
+                                                  "columnCount": max(grid_cols, width)}},
+                "fields": "gridProperties.rowCount,gridProperties.columnCount"}})
+
+        new, old = pad(values, height, width), pad(old, height, width)
+        changed = [i for i in range(height) if new[i] != old[i]]
+        # consecutive changed rows go out as one block
+        start = None
+        for i in changed + [None]:
+            if start is not None and (i is None or i != end + 1):
+                self.requests.append(update_cells(existing.id, start, 0, new[start:end + 1], colors))
+                start = None
+            if i is not None:
+                if start is None:
+                    start = i
+                end = i
+        self.changed_rows += len(changed)
+
+    def commit(self):
+        # one batch_update for the whole plan; returns the number of requests sent
+        if not self.requests:
+            return 0
+        count = len(self.requests)
+        self.spreadsheet.batch_update({"requests": self.requests})
+        self.requests = []
+        self.sheets = None
+        self.added_ids = set()
+        return count
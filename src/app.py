@@ -1,12 +1,12 @@
 import streamlit as st
+import contextlib
 import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import Processor
-from io import StringIO
-import sys
+from JobRunner import JobRunner
+from SheetsCache import CachedClient
 import os
-from amplpy import AMPL, modules
+import uuid
+# the solver (amplpy, Processor) and Sheets (gspread, oauth2client) stacks are imported
+# only where they are first needed, so the docs pages and plain reruns don't pay for them
 
 
 def TitleDescription() :
@@ -19,20 +19,34 @@ def TitleDescription() :
     using constraint-based optimization powered by AMPL.  
     Developed and maintained pro bono by **Eryk Makowski**.
     """)
-    page = st.sidebar.radio("Navigation", ["Main", "Instructions", "Example"])
+    page = st.sidebar.radio("Navigation", ["Main", "Instructions", "Example"], key="page")
 
     if page == "Instructions":
-        with open("docs/INSTRUCTIONS.md", "r", encoding="utf-8") as f:
-            instructions_md = f.read()
-            st.markdown(instructions_md, unsafe_allow_html=True)
+        st.markdown(ReadDoc("docs/INSTRUCTIONS.md"), unsafe_allow_html=True)
         st.stop()
     elif page == "Example" :
-        with open("docs/EXAMPLE.md", "r", encoding="utf-8") as f:
-            example_md = f.read()
-            st.markdown(example_md, unsafe_allow_html=True)
-        st.stop()    
+        st.markdown(ReadDoc("docs/EXAMPLE.md"), unsafe_allow_html=True)
+        st.stop()
+
+def ReadDoc( path ) :
+    # re-read only when the file changes
+    return ReadDocText( path, os.path.getmtime(path) )
 
+@st.cache_data
+def ReadDocText( path, modified ) :
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
 
+@st.cache_resource
+def InitEnvironment() :
+    # once per server process instead of on every rerun: AMPL licence and module activation
+    if "ampl_lic" in st.secrets:
+        os.makedirs(".ampl", exist_ok=True)
+        with open(".ampl/ampl.lic", "w") as f:
+            f.write(st.secrets["ampl_lic"])
+        os.environ["AMPL_LICENSE_FILE"] = os.path.abspath(".ampl/ampl.lic")
+        from amplpy import modules
+        modules.activate(st.secrets["ampl_uuid"])
 
 def GetCredentials() :
     gc = None
@@ -60,12 +74,15 @@ def GetCredentials() :
 
         if uploaded_file:
             try:
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
                 creds_dict = json.load(uploaded_file)
                 creds = ServiceAccountCredentials.from_json_keyfile_dict(
                     creds_dict,
                     ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
                 )
-                gc = gspread.authorize(creds)
+                # reruns read listings / values through the cache instead of the Sheets API
+                gc = CachedClient(gspread.authorize(creds))
                 st.session_state["gc"] = gc
                 st.session_state["user_email"] = creds_dict.get("client_email", "<unknown>")
                 st.success("✅ Authorization successful!")
@@ -91,6 +108,8 @@ def ChooseWorksheet( gc, user_email ) :
             st.markdown(f"""
 If your spreadsheet is missing, make sure it is **shared** with your service account: {user_email} and has at least **Editor** access.
 """)
+        if st.button("🔄 Refresh list", help="Spreadsheets and worksheets are cached for a few minutes"):
+            gc.refresh()
         spreadsheets = gc.openall()
         spreadsheets = [s for s in spreadsheets if not s.title.endswith("-sched")]
         spreadsheet_titles = [s.title for s in spreadsheets]
@@ -110,46 +129,208 @@ If your spreadsheet is missing, make sure it is **shared** with your service acc
         st.error(f"❌ Failed to list spreadsheets: {e}")
     return None, None
 
-def GenerateScheduleButtonWithAction( spreadsheet, worksheet ) :
-    if not st.button("🔁 4. Generate Schedule") :
-        return
-    with st.spinner("Generating schedule... this may take a few seconds..."):
-        try:
-            # Przechwytujemy output terminalowy (stdout)
+@st.cache_resource
+def GetSchedulerPool() :
+    # model-loaded AMPL instances shared by all sessions of this server
+    InitEnvironment()
+    from SchedulerPool import SchedulerPool
+    return SchedulerPool(size=int(st.secrets.get("solver_pool_size", 2)))
 
-            old_stdout = sys.stdout
-            sys.stdout = mystdout = StringIO()
+@st.cache_resource
+def GetSolutionCache() :
+    # solved schedules of unchanged worksheets, shared by all sessions
+    from SolutionCache import SolutionCache
+    return SolutionCache(st.secrets.get("solution_cache_dir", "solution_cache"))
 
-            # Uruchamiamy przetwarzanie
-            processor = Processor.Processor()
-            logging = lambda l : st.text(l)
-            processor.set_logging( logging )
-            processor.process_worksheet( spreadsheet, worksheet )
-            processor.export_schedule_to_full_sheet()
-            processor.export_schedule_to_short_sheet()
+def GetSessionId() :
+    # pool instances remember the last session, so its reruns only push changed data
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
 
-            # Przywracamy stdout
-            sys.stdout = old_stdout
+def SolverSettings() :
+    with st.expander("⚙️ Solver settings"):
+        time_limit = st.number_input("Time limit in seconds (0 = until optimal)", min_value=0, value=0, step=30)
+        mip_gap = st.number_input("Stop when within this % of the optimum", min_value=0.0, value=0.0, step=0.5)
+        force_solve = st.checkbox("Solve again even if this worksheet was already solved")
+        # Processor.SETTINGS
+        settings = {}
+        settings["backend"] = st.selectbox("Backend", ["ampl", "highs", "heuristic"],
+            help="ampl: solver pool; highs: in-process HiGHS, no AMPL; heuristic: no MIP solve")
+        from SolverPortfolio import PORTFOLIO_SOLVERS
+        settings["solvers"] = st.multiselect("Solvers (several: race them, the best schedule wins)",
+            PORTFOLIO_SOLVERS, default=["highs"]) or None
+        settings["linearized"] = st.checkbox("Linearized objective")
+        settings["symmetry_breaking"] = st.checkbox("Break symmetry between interchangeable doctors")
+        settings["heuristic_start"] = st.checkbox("Start the solver from the heuristic schedule")
+        if st.checkbox("Solve long horizons in overlapping blocks (rolling horizon)"):
+            block = st.number_input("Block length in days", min_value=7, value=35, step=7)
+            overlap = st.number_input("Overlap in days", min_value=0, max_value=block - 1, value=7, step=1)
+            settings["rolling_horizon"] = (int(block), int(overlap))
+    return (time_limit or None), (mip_gap / 100 if mip_gap else None), force_solve, settings
 
-            # Wyświetlamy przechwycony output
-            st.success("✅ Schedule generated and exported successfully!")
-            with st.expander("📋 Output log"):
-                st.text(mystdout.getvalue())
+@st.cache_resource
+def GetJobRunner() :
+    # background solve jobs of all sessions
+    return JobRunner(max_workers=int(st.secrets.get("job_workers", 2)))
 
+def RunScheduleJob( job, pool, cache, spreadsheet, worksheet, time_limit, mip_gap, force_solve, settings, session ) :
+    # runs on a JobRunner thread: everything is logged into the job, nothing touches the page
+    import Processor
+    processor = Processor.Processor()
+    processor.set_logging( job.log )
+    processor.time_limit = time_limit
+    processor.mip_gap = mip_gap
+    processor.cache = cache
+    processor.force_solve = force_solve
+    processor.configure( settings )
+    processor.set_progress( job.set_progress )
+    job.processor = processor
+    job.phase = "waiting for a solver"
+    # validation row and both exports go out as one batched write at the end
+    processor.begin_writes( spreadsheet )
+    try:
+        with contextlib.ExitStack() as stack:
+            # only the AMPL backend solves on pooled models, highs / heuristic run in the job
+            if processor.backend == "ampl":
+                try:
+                    if pool is None:
+                        raise Exception("AMPL environment not available")
+                    processor.set_model( stack.enter_context( pool.acquire( owner=session, timeout=300 ) ) )
+                except Exception as e:
+                    # no solver to be had: export the heuristic schedule instead of failing
+                    job.log(f"⚠️ No solver ({e}), using the heuristic schedule")
+                    processor.backend = "heuristic"
+            processor.process_worksheet( spreadsheet, worksheet )
+        processor.phase = "exporting"
+        processor.export_schedule_to_full_sheet()
+        processor.export_schedule_to_short_sheet()
+    finally:
+        processor.commit_writes()
+    processor.phase = "done"
+    job.phase = "done"
+    return {"optimal": processor.optimal, "cache_hit": processor.cache_hit, "method": processor.method,
+            "pool": pool.stats() if pool is not None else None}
+
+def GetCurrentJob() :
+    # the session's job survives reruns (session state) and page reloads (?job= in the URL)
+    runner = GetJobRunner()
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = runner.get(job_id) if job_id else None
+    return job or runner.latest(GetSessionId())
+
+def GenerateScheduleButtonWithAction( spreadsheet, worksheet ) :
+    time_limit, mip_gap, force_solve, settings = SolverSettings()
+    job = GetCurrentJob()
+    running = job is not None and job.active
+    if st.button("🔁 4. Generate Schedule", disabled=running) :
+        # cached resources are looked up here, on the script thread
+        session, cache = GetSessionId(), GetSolutionCache()
+        try:
+            pool = GetSchedulerPool() if settings["backend"] == "ampl" else None
         except Exception as e:
-            sys.stdout = old_stdout  # upewniamy się że stdout wróci
-            st.error(f"Something went wrong: {e}")                
+            st.warning(f"⚠️ Solver unavailable ({e}) – a heuristic schedule will be exported.")
+            pool = None
+        job = GetJobRunner().submit( session, f"{spreadsheet.title} → {worksheet.title}",
+            lambda job : RunScheduleJob( job, pool, cache, spreadsheet, worksheet, time_limit, mip_gap, force_solve, settings, session ) )
+        st.session_state["job_id"] = job.id
+        st.query_params["job"] = job.id
+        st.rerun()
+    PreviewButtonWithAction( spreadsheet, worksheet )
+    ScoreButtonWithAction( spreadsheet, worksheet )
+    if job is not None:
+        if job.active:
+            JobProgress()
+        else:
+            JobResult( job )
 
-# st.markdown("{}".format(st.secrets["ampl_lic"].split('\n')[0]))
+def PreviewButtonWithAction( spreadsheet, worksheet ) :
+    # quick heuristic schedule on the script thread, nothing is written to the spreadsheet
+    if not st.button("👀 Quick preview", help="A good schedule in about a second, without the solver"):
+        return
+    import Processor
+    processor = Processor.Processor()
+    lines = []
+    processor.set_logging( lines.append )
+    try:
+        processor.load_worksheet( spreadsheet, worksheet )
+        processor.preview()
+    except Exception as e:
+        st.error(f"Preview failed: {e}")
+    else:
+        st.info(f"👀 Preview (heuristic, not written): total cost {processor.total_cost:.2f}")
+        st.dataframe({"Date": processor.date_labels, "On-call": processor.assignment},
+                     hide_index=True, use_container_width=True)
+    with st.expander("📋 Preview log"):
+        st.text("\n".join(lines))
 
-if "ampl_lic" in st.secrets:
-    os.makedirs(".ampl", exist_ok=True)
-    with open(".ampl/ampl.lic", "w") as f:
-        f.write(st.secrets["ampl_lic"])
-        os.environ["AMPL_LICENSE_FILE"] = os.path.abspath(".ampl/ampl.lic")
-        modules.activate(st.secrets["ampl_uuid"])
-        # st.markdown("AMPL configured")
+def ScoreButtonWithAction( spreadsheet, worksheet ) :
+    # cost and broken constraints of the hand-edited -full-sched sheet, nothing is solved or written
+    if not st.button("🧮 Score edited schedule", help=f"Checks {worksheet.title}-full-sched as it is now"):
+        return
+    import Processor
+    processor = Processor.Processor()
+    processor.set_logging( lambda line : None )
+    try:
+        score = processor.score_schedule_sheet( spreadsheet, worksheet )
+    except Exception as e:
+        st.error(f"Scoring failed: {e}")
+        return
+    st.info(f"🧮 Total cost of the edited schedule: {score['total_cost']:.2f}")
+    st.dataframe([{"term": name, "cost": round(value, 2)} for name, value in score["costs"].items()],
+                 hide_index=True, use_container_width=True)
+    for line in score["problems"] + score["violations"]:
+        st.warning(f"⚠️ {line}")
+    if not score["violations"]:
+        st.success("✅ No constraint violated")
+
+@st.fragment(run_every=1)
+def JobProgress() :
+    # reruns only this fragment every second while the job is running
+    job = GetCurrentJob()
+    if job is None:
+        return
+    if not job.active:
+        st.rerun()  # whole page, to show the result
+    st.info(f"⏳ {job.title}: {job.current_phase or job.status} ({job.seconds:.0f}s)")
+    p = job.progress
+    if p:
+        st.text(f"best schedule: {p['incumbent']}, bound: {p['bound']}, gap: {p['gap']}%")
+    with st.expander("📋 Output log"):
+        st.text("\n".join(job.lines[-50:]))
 
+def JobResult( job ) :
+    if job.status == "failed":
+        st.error(f"Something went wrong: {job.error}")
+    else:
+        if job.result["cache_hit"]:
+            st.info("♻️ Worksheet unchanged since the last run – the cached schedule was exported.")
+        if job.result.get("method") == "heuristic":
+            st.warning("⚠️ No solver was available – the exported schedule comes from the heuristic, not proven optimal.")
+        elif job.result["optimal"]:
+            st.success(f"✅ {job.title}: schedule generated and exported successfully!")
+        else:
+            st.warning("⚠️ Time limit reached – the exported schedule is the best found so far, not proven optimal.")
+    with st.expander("📋 Output log"):
+        st.text(job.output())
+    if job.processor is not None:
+        RunReportTable( job.processor.report )
+    if job.result and job.result["pool"]:
+        with st.expander("🏊 Solver pool"):
+            st.json(job.result["pool"])
+
+def RunReportTable( report ) :
+    # where the time of this run went, and what the solver reported
+    for alert in report.alerts():
+        st.warning(f"⚠️ {alert}")
+    with st.expander("⏱️ Run report"):
+        st.dataframe(report.table(), hide_index=True, use_container_width=True)
+        if report.solver:
+            st.dataframe(report.solver_table(), hide_index=True, use_container_width=True)
+        st.download_button("Download report (JSON)", report.to_json(indent=1),
+                           file_name="run-report.json", mime="application/json")
+
+# st.markdown("{}".format(st.secrets["ampl_lic"].split('\n')[0]))
 
 TitleDescription()
 gc, user_email = GetCredentials() # this will rerun if credentials are wrong